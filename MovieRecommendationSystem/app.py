@@ -1,26 +1,24 @@
-from flask import Flask, g
+from flask import Flask
 from flask_login import LoginManager
 from config import Config
 from database.db import init_db,db
-from database.models import User, Movie
+from database.browse import ensure_browse_indexes
+from database.genres import backfill_movie_genres
+from database.models import User
+from database.revision import ensure_catalog_revision
+from database.search import ensure_search_index
+import http_cache
+import metrics
+import profiler
 from routes.auth import auth_bp
 from routes.movies import movies_bp
 from routes.user import user_bp
-from recommender.engine import RecommendationEngine
+from recommender.cache import recommendation_cache
+from recommender.manager import engine_manager
 
 def get_recommendation_engine():
-    """Get the recommendation engine, initializing if needed."""
-    if 'recommendation_engine' not in g:
-        try:
-            movies = Movie.query.all()
-            if movies:
-                g.recommendation_engine = RecommendationEngine(movies=movies)
-            else:
-                g.recommendation_engine = None
-        except Exception as e:
-            print(f"Error getting recommendation engine: {e}")
-            g.recommendation_engine = None
-    return g.recommendation_engine
+    """Get the process-wide recommendation engine (None until a catalog is loaded)."""
+    return engine_manager.get()
 
 def create_app():
     app = Flask(__name__)
@@ -73,6 +71,25 @@ def create_app():
     # Create tables
     with app.app_context():
         db.create_all()
+        # Revision counter (and SQLite triggers) that catalog fingerprints and HTTP validators read
+        ensure_catalog_revision()
+        # Catalogs loaded before the genres table existed
+        backfill_movie_genres()
+        # Keyset pagination indexes for tables created before they were declared
+        ensure_browse_indexes()
+        # Full-text search index (SQLite FTS5), built here if it does not cover the catalog
+        ensure_search_index()
+    
+    # Request, SQL and recommender timings at /metrics
+    metrics.init_app(app, db)
+    # cProfile of flagged or sampled requests (no hooks unless PROFILE_DIR is configured)
+    profiler.init_app(app)
+    # Conditional GET validators on catalog pages and Cache-Control per blueprint
+    http_cache.init_app(app)
+    
+    # Build the shared recommendation engine once per worker process
+    engine_manager.init_app(app)
+    recommendation_cache.init_app(app)
     
     return app
 
@@ -0,0 +1,75 @@
+"""Recall@K and latency of the ANN recommender mode against exact results.
+
+Builds an exact engine ('ondemand' mode, which scores every movie) and an
+'ann' engine over the same synthetic catalog, then sweeps n_probe and reports
+how many of the exact get_similar_movies neighbors the ANN index returns.
+
+Usage:
+    python -m benchmarks.ann_recall [--movies 50000] [--lists 0] [--queries 200] [--k 10]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_movies
+from recommender.engine import RecommendationEngine
+
+PROBES = (1, 2, 4, 8, 16, 32, 64)
+
+
+def timed_batch(engine, movie_ids, k):
+    """Run get_similar_movies once per query, returning results and per-query ms."""
+    results, latencies = [], []
+    for movie_id in movie_ids:
+        started = time.perf_counter()
+        results.append(engine.get_similar_movies(movie_id, top_n=k))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, np.array(latencies)
+
+
+def recall_at_k(exact, approx):
+    hits = [len({m.id for m, _ in e} & {m.id for m, _ in a}) / max(1, len(e)) for e, a in zip(exact, approx)]
+    return float(np.mean(hits))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--movies', type=int, default=50000)
+    parser.add_argument('--lists', type=int, default=0, help='ANN clusters (0 = sqrt of catalog size)')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    movies = synthetic_movies(args.movies)
+    with redirect_stdout(io.StringIO()):
+        exact_engine = RecommendationEngine(movies=movies, mode='ondemand')
+        started = time.perf_counter()
+        ann_engine = RecommendationEngine(movies=movies, mode='ann', ann_lists=args.lists or None)
+        build_seconds = time.perf_counter() - started
+
+    query_ids = random.Random(3).sample(range(1, args.movies + 1), args.queries)
+    exact, exact_ms = timed_batch(exact_engine, query_ids, args.k)
+
+    index = ann_engine._similarity
+    print(f"Catalog: {args.movies} movies, {index.n_lists} lists, "
+          f"ANN engine fit in {build_seconds:.1f}s, {args.queries} queries, recall@{args.k}")
+    print(f"{'n_probe':>8} {'recall':>8} {'p50':>9} {'p99':>9}")
+    print(f"{'exact':>8} {1.0:>8.3f} {np.median(exact_ms):>7.2f}ms {np.percentile(exact_ms, 99):>7.2f}ms")
+    for n_probe in PROBES:
+        if n_probe > index.n_lists:
+            break
+        index.n_probe = n_probe
+        approx, approx_ms = timed_batch(ann_engine, query_ids, args.k)
+        print(f"{n_probe:>8} {recall_at_k(exact, approx):>8.3f} "
+              f"{np.median(approx_ms):>7.2f}ms {np.percentile(approx_ms, 99):>7.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Latency of personalized recommendations by watchlist size.
+
+Compares the batched scoring in RecommendationEngine.get_recommendations_for_movies
+with the previous per-movie loop (full argsort of every seed row plus a Python
+membership check per neighbor).
+
+Usage:
+    python -m benchmarks.bench_user_recommendations [--movies 20000] [--repeat 20]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_movies
+from recommender.engine import RecommendationEngine
+
+WATCHLIST_SIZES = (1, 50, 500)
+
+
+def legacy_recommendations(engine, movie_ids, top_n):
+    """The per-movie loop get_recommendations_for_user used before batching."""
+    preprocessor = engine._preprocessor
+    matrix = preprocessor.tfidf_matrix
+    aggregated_scores = np.zeros(matrix.shape[0])
+    for movie_id in movie_ids:
+        idx = preprocessor.get_movie_index(movie_id)
+        scores = (matrix[idx] @ matrix.T).toarray().ravel()
+        for similar_idx in np.argsort(scores)[::-1][1:51]:
+            similar_id = preprocessor.get_movie_id(int(similar_idx))
+            if similar_id not in movie_ids:
+                aggregated_scores[similar_idx] += scores[similar_idx]
+    return np.argsort(aggregated_scores)[::-1][:top_n]
+
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return np.median(samples), np.percentile(samples, 99)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--movies', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--top-n', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    movies = synthetic_movies(args.movies)
+    with redirect_stdout(io.StringIO()):
+        engine = RecommendationEngine(movies=movies)
+
+    rng = random.Random(7)
+    print(f"Catalog: {args.movies} movies, top_n={args.top_n}, {args.repeat} runs each")
+    print(f"{'watchlist':>10} {'batched p50':>12} {'p99':>9} {'legacy p50':>12} {'p99':>9}")
+    for size in WATCHLIST_SIZES:
+        movie_ids = rng.sample(range(1, args.movies + 1), size)
+        batched = time_call(lambda: engine.get_recommendations_for_movies(movie_ids, args.top_n), args.repeat)
+        legacy_repeat = max(1, args.repeat // 10) if size > 50 else args.repeat
+        legacy = time_call(lambda: legacy_recommendations(engine, movie_ids, args.top_n), legacy_repeat)
+        print(f"{size:>10} {batched[0]:>10.2f}ms {batched[1]:>7.2f}ms {legacy[0]:>10.2f}ms {legacy[1]:>7.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
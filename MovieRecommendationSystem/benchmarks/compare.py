@@ -0,0 +1,41 @@
+"""Compare two benchmark suite reports stage by stage.
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/abc1234-neighbors.json benchmarks/results/def5678-neighbors.json
+"""
+import argparse
+import json
+
+METRICS = ('wall_s', 'p50_ms', 'p99_ms', 'peak_rss_mb')
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report, {result['movies']: result['stages'] for result in report['results']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('base')
+    parser.add_argument('new')
+    args = parser.parse_args(argv)
+
+    base_report, base = load(args.base)
+    new_report, new = load(args.new)
+    print(f"base {base_report['commit']} ({base_report['options']['mode']})  ->  "
+          f"new {new_report['commit']} ({new_report['options']['mode']})")
+    print(f"{'movies':>8} {'stage':<30} {'metric':<12} {'base':>11} {'new':>11} {'change':>8}")
+    for n_movies in sorted(base.keys() & new.keys()):
+        for stage, base_info in base[n_movies].items():
+            new_info = new[n_movies].get(stage, {})
+            for metric in METRICS:
+                if metric not in base_info or metric not in new_info:
+                    continue
+                old, cur = base_info[metric], new_info[metric]
+                change = f"{(cur - old) / old * 100:+.1f}%" if old else 'n/a'
+                print(f"{n_movies:>8} {stage:<30} {metric:<12} {old:>11.3f} {cur:>11.3f} {change:>8}")
+
+
+if __name__ == '__main__':
+    main()
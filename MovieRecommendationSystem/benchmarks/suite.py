@@ -0,0 +1,253 @@
+"""Recommender benchmark suite over synthetic catalogs from 1k to 1M movies.
+
+For each catalog size, in a fresh process, measures:
+
+    fit                            MoviePreprocessor.fit (TF-IDF)
+    build                          similarity backend for --mode
+    get_similar_movies             per-call latency over random movies
+    get_recommendations_for_user   per-call latency, watchlists in in-memory SQLite
+    compute_similarity_matrix      dense N×N matrix, skipped above --dense-limit
+
+Each stage reports wall time, p50/p99 per-call latency where it makes
+sense, and peak RSS. On Linux the RSS high-water mark is reset before every
+stage, so each stage's peak is its own; elsewhere it is the process peak
+so far (the dense matrix runs last so it does not mask the others).
+
+Results are written as JSON tagged with the git commit, so two runs can be
+compared with `python -m benchmarks.compare old.json new.json`.
+
+Usage:
+    python -m benchmarks.suite [--scales 1k,10k,100k] [--mode neighbors] [--out results.json]
+    python -m benchmarks.suite --scales 1m --mode ondemand --queries 200 --users 200
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_movies, synthetic_watchlists
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000}
+
+
+def parse_scale(value):
+    return SCALES.get(value.lower()) or int(value)
+
+
+def reset_peak_rss():
+    """Reset the kernel's RSS high-water mark; False where that is not supported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def latency_summary(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        'calls': len(samples),
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'mean_ms': round(float(samples.mean()), 4),
+    }
+
+
+class Stage:
+    """Times a block and records its wall time and peak RSS into `results`."""
+
+    def __init__(self, results, name):
+        self.results = results
+        self.name = name
+        self.info = {}
+
+    def __enter__(self):
+        reset_peak_rss()
+        self.started = time.perf_counter()
+        return self.info
+
+    def __exit__(self, *exc):
+        self.info['wall_s'] = round(time.perf_counter() - self.started, 4)
+        self.info['peak_rss_mb'] = round(peak_rss_mb(), 1)
+        self.results[self.name] = self.info
+        print(f"  {self.name}: {self.info['wall_s']:.2f}s, peak RSS {self.info['peak_rss_mb']:.0f} MiB",
+              file=sys.stderr)
+
+
+def timed_calls(fn, args_list, warmup=5):
+    for args in args_list[:warmup]:
+        fn(*args)
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def watchlist_app(watchlists):
+    """Flask app on in-memory SQLite holding one Watchlist row per entry, users numbered from 1."""
+    from flask import Flask
+    from sqlalchemy.pool import StaticPool
+
+    from database.db import db
+    from database.models import Watchlist
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'poolclass': StaticPool}
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Watchlist.__table__.insert(), [
+            {'user_id': user_id, 'movie_id': movie_id, 'watched': watched}
+            for user_id, entries in enumerate(watchlists, start=1)
+            for movie_id, watched in entries
+        ])
+        db.session.commit()
+    return app
+
+
+def run_scale(n_movies, options):
+    """Run every stage for one catalog size; meant to run in its own process."""
+    from recommender.engine import RecommendationEngine
+    from recommender.metadata import MovieMetadataStore
+    from recommender.preprocess import MoviePreprocessor
+
+    print(f"{n_movies} movies ({options['mode']} mode)", file=sys.stderr)
+    stages = {}
+    rng = random.Random(options['seed'])
+
+    with Stage(stages, 'generate'):
+        movies = synthetic_movies(n_movies, seed=options['seed'])
+        watchlists = synthetic_watchlists(options['users'], movies, seed=options['seed'])
+
+    with Stage(stages, 'fit') as info, redirect_stdout(io.StringIO()):
+        preprocessor = MoviePreprocessor().fit(movies, workers=options['workers'])
+        info['vocabulary'] = len(preprocessor.vectorizer.vocabulary_)
+
+    with Stage(stages, 'build'):
+        engine = RecommendationEngine(mode=options['mode'], top_k=options['top_k'],
+                                      embedding_dim=options['embedding_dim'],
+                                      build_workers=options['workers'])
+        with redirect_stdout(io.StringIO()):
+            engine._build(preprocessor, MovieMetadataStore.from_movies(movies))
+    del movies
+
+    query_ids = [(rng.randint(1, n_movies), options['top_n']) for _ in range(options['queries'])]
+    with Stage(stages, 'get_similar_movies') as info:
+        info.update(latency_summary(timed_calls(engine.get_similar_movies, query_ids)))
+
+    app = watchlist_app(watchlists)
+    user_ids = [(user_id, options['top_n']) for user_id in range(1, len(watchlists) + 1)]
+    with app.app_context():
+        with Stage(stages, 'get_recommendations_for_user') as info:
+            info.update(latency_summary(timed_calls(engine.get_recommendations_for_user, user_ids)))
+            info['median_watchlist'] = int(np.median([len(entries) for entries in watchlists]))
+
+    if n_movies <= options['dense_limit']:
+        with Stage(stages, 'compute_similarity_matrix') as info:
+            info['bytes'] = int(preprocessor.compute_similarity_matrix().nbytes)
+    else:
+        stages['compute_similarity_matrix'] = {
+            'skipped': f"above --dense-limit {options['dense_limit']}",
+            'bytes': n_movies * n_movies * 8,
+        }
+
+    return {'movies': n_movies, 'users': len(watchlists), 'stages': stages}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def environment():
+    import scipy
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', default='1k,10k,100k',
+                        help='Comma-separated catalog sizes (1k, 10k, 100k, 1m or integers)')
+    parser.add_argument('--mode', default='neighbors', help='Recommender mode to build')
+    parser.add_argument('--top-k', type=int, default=50)
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--embedding-dim', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=1, help='Build workers')
+    parser.add_argument('--queries', type=int, default=1000, help='get_similar_movies calls')
+    parser.add_argument('--users', type=int, default=1000, help='get_recommendations_for_user calls')
+    parser.add_argument('--dense-limit', type=int, default=20000,
+                        help='Largest catalog to build the dense similarity matrix for')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help='JSON output path (default benchmarks/results/<commit>-<mode>.json)')
+    args = parser.parse_args(argv)
+
+    options = {key: value for key, value in vars(args).items() if key not in ('scales', 'out')}
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'options': options,
+        'peak_rss_scope': 'stage' if reset_peak_rss() else 'process',
+        'results': [],
+    }
+
+    # One fresh process per size, so peak RSS and allocator state do not carry over
+    for n_movies in [parse_scale(scale) for scale in args.scales.split(',')]:
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            report['results'].append(pool.submit(run_scale, n_movies, options).result())
+
+    out = args.out or os.path.join(ROOT, 'benchmarks', 'results', f"{commit}-{args.mode}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
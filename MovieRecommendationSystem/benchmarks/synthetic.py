@@ -0,0 +1,80 @@
+"""Seeded synthetic movie catalogs and watchlists for benchmarks.
+
+Each movie is drawn around one of a fixed set of topics (a themed word pool
+plus a pair of genres), so catalogs have the cluster structure real overviews
+have instead of uniformly random text. Popularity and vote counts are
+heavy-tailed like TMDB's (a few blockbusters, a long tail of obscure titles),
+and watchlists favour popular movies, so both ranking fallbacks and
+neighbor lookups see realistic access patterns.
+"""
+import bisect
+import itertools
+import random
+from types import SimpleNamespace
+
+WORDS = ('space war love crime family detective robot ship island city night ghost '
+         'heist king queen dragon school doctor river storm secret agent journey '
+         'music dance prison escape revenge alien planet future past kingdom '
+         'soldier village murder mystery police wedding friendship betrayal empire '
+         'desert ocean mountain forest train hospital lawyer hunter witch vampire '
+         'monster zombie magic college team coach champion band singer artist '
+         'writer father mother brother sister daughter son teacher student nurse').split()
+GENRES = ('action adventure animation comedy crime documentary drama family fantasy '
+          'history horror music mystery romance thriller war western').split()
+# original_language codes, roughly in TMDB proportions
+LANGUAGES = (('en', 60), ('fr', 7), ('ja', 6), ('es', 5), ('de', 4), ('it', 4), ('ko', 3),
+             ('zh', 3), ('hi', 3), ('ru', 2), ('pt', 2), ('sv', 1))
+
+
+def synthetic_movies(n_movies, n_topics=200, seed=42):
+    """Return n_movies objects with the Movie attributes the recommender reads."""
+    rng = random.Random(seed)
+    topics = [(rng.sample(WORDS, 8), ' '.join(rng.sample(GENRES, 2))) for _ in range(n_topics)]
+    languages = [code for code, _ in LANGUAGES]
+    language_weights = list(itertools.accumulate(weight for _, weight in LANGUAGES))
+
+    movies = []
+    for movie_id in range(1, n_movies + 1):
+        topic_words, genres = topics[rng.randrange(n_topics)]
+        words = [rng.choice(topic_words) if rng.random() < 0.7 else rng.choice(WORDS)
+                 for _ in range(rng.randint(10, 30))]
+        overview = ' '.join(words)
+        popularity = rng.paretovariate(1.2)
+        movies.append(SimpleNamespace(
+            id=movie_id,
+            tmdb_id=100000 + movie_id,
+            title=f"Movie {movie_id}",
+            overview=overview,
+            genres=genres.title(),
+            combined_features=f"{overview} {genres} {genres}",
+            original_language=rng.choices(languages, cum_weights=language_weights)[0],
+            release_date=f"{rng.randint(1920, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            poster_path=f"/poster{movie_id}.jpg",
+            backdrop_path=f"/backdrop{movie_id}.jpg",
+            vote_count=min(int(popularity * rng.uniform(5, 50)), 40000),
+            vote_average=round(min(10.0, max(1.0, rng.gauss(6.3, 1.1))), 1),
+            popularity=round(popularity, 3),
+        ))
+    return movies
+
+
+def synthetic_watchlists(n_users, movies, median_size=15, max_size=1000, seed=7):
+    """Return n_users watchlists as lists of (movie_id, watched) pairs.
+
+    Sizes are log-normal around median_size (most users keep a short list,
+    a few keep hundreds) and movies are picked with probability proportional
+    to popularity. About 60% of entries are marked watched.
+    """
+    rng = random.Random(seed)
+    movie_ids = [movie.id for movie in movies]
+    cum_weights = list(itertools.accumulate(movie.popularity for movie in movies))
+    total = cum_weights[-1]
+
+    watchlists = []
+    for _ in range(n_users):
+        size = min(max_size, len(movie_ids), max(1, int(rng.lognormvariate(0, 1) * median_size)))
+        chosen = set()
+        while len(chosen) < size:
+            chosen.add(movie_ids[bisect.bisect(cum_weights, rng.random() * total)])
+        watchlists.append([(movie_id, rng.random() < 0.6) for movie_id in chosen])
+    return watchlists
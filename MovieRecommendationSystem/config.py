@@ -30,10 +30,70 @@ class Config:
     # -----------------------
     MOVIES_PER_PAGE = 20
 
+    # -----------------------
+    # HTTP Caching Configuration
+    # -----------------------
+    # Seconds browsers and proxies may reuse anonymous catalog pages without revalidating
+    # (0 = always revalidate; unchanged pages still come back as 304 Not Modified)
+    HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', 60))
+
+    # -----------------------
+    # Search Configuration
+    # -----------------------
+    # Let /search match words in overviews as well as titles (titles still rank higher)
+    SEARCH_INCLUDE_OVERVIEW = os.environ.get('SEARCH_INCLUDE_OVERVIEW', 'false').lower() in ('1', 'true', 'yes')
+
     # -----------------------
     # Recommendations Configuration
     # -----------------------
     TOP_N_RECOMMENDATIONS = 10
+    # Per-user recommendation cache: max users kept (0 disables) and seconds an entry lives
+    RECOMMENDATION_CACHE_SIZE = int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 10000))
+    RECOMMENDATION_CACHE_TTL = int(os.environ.get('RECOMMENDATION_CACHE_TTL', 600))
+    # Stream the catalog from the database in chunks of this many rows when fitting, so its
+    # text never has to fit in memory at once (0 loads it in one query)
+    RECOMMENDER_FIT_CHUNK_SIZE = int(os.environ.get('RECOMMENDER_FIT_CHUNK_SIZE', 0))
+    # Processes used to fit the model (tokenization and neighbor table); 1 builds in-process
+    RECOMMENDER_BUILD_WORKERS = int(os.environ.get('RECOMMENDER_BUILD_WORKERS', 1))
+    # Worker processes for `python -m recommender precompute` (0 = one per core)
+    RECOMMENDER_BATCH_WORKERS = int(os.environ.get('RECOMMENDER_BATCH_WORKERS', 0))
+    # Seconds between catalog fingerprint checks; a change triggers a background refit
+    RECOMMENDER_CHECK_INTERVAL = int(os.environ.get('RECOMMENDER_CHECK_INTERVAL', 60))
+    # Small catalog changes are patched into the running engine; a full refit (new vocabulary,
+    # exact neighbor lists) still runs at most this many seconds apart, 0 to always refit fully
+    RECOMMENDER_FULL_REFIT_INTERVAL = int(os.environ.get('RECOMMENDER_FULL_REFIT_INTERVAL', 86400))
+    # 'neighbors' keeps a top-K table per movie (O(N·K) memory); 'dense' keeps the full N×N matrix;
+    # 'ondemand' keeps only the sparse TF-IDF matrix and scores each query row when asked;
+    # 'ann' probes the closest clusters of an inverted-file index (approximate, for very large catalogs)
+    RECOMMENDER_MODE = os.environ.get('RECOMMENDER_MODE', 'neighbors')
+    RECOMMENDER_TOP_K = 50
+    # ANN clusters (0 = sqrt of catalog size) and clusters probed per query: more probes, higher recall
+    RECOMMENDER_ANN_LISTS = int(os.environ.get('RECOMMENDER_ANN_LISTS', 0))
+    RECOMMENDER_ANN_PROBE = int(os.environ.get('RECOMMENDER_ANN_PROBE', 8))
+    # Project TF-IDF to a dense LSA embedding of this dimension (e.g. 64-256); 0 keeps sparse TF-IDF
+    RECOMMENDER_EMBEDDING_DIM = int(os.environ.get('RECOMMENDER_EMBEDDING_DIM', 0))
+    # Prebuilt model artifacts (`python -m recommender build`); workers mmap the CURRENT one
+    RECOMMENDER_ARTIFACT_DIR = os.environ.get(
+        'RECOMMENDER_ARTIFACT_DIR',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_artifacts')
+    )
+
+    # -----------------------
+    # Monitoring Configuration
+    # -----------------------
+    # Serve request, SQL and recommender metrics at /metrics (Prometheus text format); off by default
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    # Require `Authorization: Bearer <token>` on /metrics (unset leaves it open, e.g. behind a proxy)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+    # Request profiling: cProfile output directory (unset disables profiling entirely)
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or None
+    # Profile requests flagged with `X-Profile: <token>` / `?profile=<token>`, or flagged by these users
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN') or None
+    PROFILE_USERS = [name for name in os.environ.get('PROFILE_USERS', '').split(',') if name]
+    # Also profile 1 in every N requests (0 = only flagged ones)
+    PROFILE_SAMPLE_RATE = int(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    # Profile each run_etl_pipeline stage (extract, transform, load) into PROFILE_DIR
+    PROFILE_ETL = os.environ.get('PROFILE_ETL', 'false').lower() in ('1', 'true', 'yes')
 
 # Optional: separate config classes for different environments
 class DevelopmentConfig(Config):
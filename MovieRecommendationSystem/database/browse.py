@@ -0,0 +1,202 @@
+"""Keyset (seek) pagination for the catalog browse page and watchlists.
+
+Each sort order ends with Movie.id as a tiebreaker and has a matching
+composite index on movies, so a page is one index range scan starting
+right after the previous page's last row: `WHERE (popularity, id) < (?, ?)
+ORDER BY popularity DESC, id DESC LIMIT n`. Page 500 reads the same number
+of rows as page 1, where OFFSET would read and discard all 499 pages before
+it. The position travels in the URL as an opaque cursor; a bare ?page=N
+(old links, hand-edited URLs) still works through OFFSET.
+
+Totals for "Page N of M" come from a count cached per catalog version and
+genre instead of a COUNT(*) on every request.
+
+Watchlists page the same way, newest first over (user_id, added_at, id),
+with each entry's movie joined into the page query.
+"""
+import base64
+import json
+import threading
+from datetime import datetime
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import joinedload
+
+from database.db import db
+from database.genres import filter_by_genre
+from database.models import Movie, Watchlist
+
+# Sort name -> columns, all descending; every one has a (columns..., id) index on movies
+SORT_COLUMNS = {
+    'popularity': (Movie.popularity, Movie.id),
+    'rating': (Movie.vote_average, Movie.vote_count, Movie.id),
+    'recent': (Movie.release_date, Movie.id),
+}
+DEFAULT_SORT = 'popularity'
+# Watchlist order within one user, newest first; indexed as (user_id, added_at, id)
+WATCHLIST_COLUMNS = (Watchlist.added_at, Watchlist.id)
+# NULLs would fall outside every (column, id) range; writers store these instead (sort_value())
+NULL_DEFAULTS = {Movie.popularity: 0.0, Movie.vote_average: 0.0, Movie.vote_count: 0, Movie.release_date: ''}
+
+
+def ensure_browse_indexes():
+    """Create the sort indexes on databases whose movies and watchlist tables predate them.
+
+    create_all() only adds indexes together with a new table. Sort columns
+    that are NULL (rows written before the ETL coalesced them) are set to
+    their empty value, since keyset comparisons never match NULL.
+    """
+    for index in Movie.__table__.indexes | Watchlist.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    filled = 0
+    for column, default in NULL_DEFAULTS.items():
+        filled += Movie.query.filter(column.is_(None)).update({column: default}, synchronize_session=False)
+    db.session.commit()
+    if filled:
+        print(f"Filled {filled} empty sort values")
+
+
+def sort_value(column, value):
+    """`value` for sort column `column`, with None (or a pandas NaN) replaced by its NULL_DEFAULTS entry."""
+    if value is None or value != value:
+        return NULL_DEFAULTS[column]
+    return value
+
+
+def encode_cursor(row, columns):
+    """Opaque, URL-safe position of `row` in an order over `columns`."""
+    values = [getattr(row, column.key) for column in columns]
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Column values from encode_cursor(), or None if the cursor is malformed.
+
+    Elements other than str, int, float or None (e.g. a JSON object) are
+    rejected, so a tampered cursor falls back to the first page instead of
+    reaching the SQL comparison.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        # Only what encode_cursor() writes; bool is an int subclass but never a sort value
+        if any(isinstance(value, bool) or not isinstance(value, (str, int, float, type(None)))
+               for value in values):
+            return None
+        return [datetime.fromisoformat(value) if isinstance(column.type, db.DateTime) and value is not None
+                else value for column, value in zip(columns, values)]
+    except (TypeError, ValueError):
+        return None
+
+
+class CountCache:
+    """Movie counts per genre ('' for all), dropped whenever the catalog version changes."""
+
+    def __init__(self):
+        # (version, {genre: count}) swapped as one reference, like GenreListCache
+        self._entry = (None, {})
+        self._lock = threading.Lock()
+
+    def get(self, version, genre=''):
+        version_seen, counts = self._entry
+        if version is not None and version_seen == version and genre in counts:
+            return counts[genre]
+        query = db.session.query(func.count(Movie.id))
+        if genre:
+            query = filter_by_genre(query, genre)
+        count = query.scalar()
+        if version is not None:
+            with self._lock:
+                if self._entry[0] != version:
+                    self._entry = (version, {})
+                self._entry[1][genre] = count
+        return count
+
+    def clear(self):
+        self._entry = (None, {})
+
+
+count_cache = CountCache()
+
+
+class BrowsePage:
+    """One page of rows, with the attributes templates used from Flask-SQLAlchemy's Pagination."""
+
+    def __init__(self, items, page, per_page, total, columns, has_prev, has_next):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.pages = max(1, -(-total // per_page))
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.prev_num = page - 1
+        self.next_num = page + 1
+        self.prev_cursor = encode_cursor(items[0], columns) if items and has_prev else None
+        self.next_cursor = encode_cursor(items[-1], columns) if items and has_next else None
+
+
+def _seek(query, columns, page, after, before, per_page):
+    """Rows of `query` for one page in descending `columns` order.
+
+    Returns:
+        (items, page, has_prev, has_next)
+    """
+    page = max(page, 1)
+    after_values = decode_cursor(after, columns) if after else None
+    before_values = decode_cursor(before, columns) if before else None
+    if before_values is not None:
+        # Walk backwards from the cursor, then restore the display order
+        rows = query.filter(tuple_(*columns) > tuple_(*before_values)).order_by(
+            *[column.asc() for column in columns]).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        page = max(page, 2) if has_prev else 1
+        return rows[:per_page][::-1], page, has_prev, True
+
+    query = query.order_by(*[column.desc() for column in columns])
+    if after_values is not None:
+        query = query.filter(tuple_(*columns) < tuple_(*after_values))
+    elif page > 1:
+        query = query.offset((page - 1) * per_page)
+    rows = query.limit(per_page + 1).all()
+    return rows[:per_page], page, page > 1 or after_values is not None, len(rows) > per_page
+
+
+def browse_movies(sort_by=DEFAULT_SORT, genre='', page=1, after=None, before=None,
+                  per_page=20, version=None):
+    """One page of movies in `sort_by` order, optionally within one genre.
+
+    Args:
+        sort_by: Key of SORT_COLUMNS; unknown values use DEFAULT_SORT
+        genre: Genre name to filter on, '' for all
+        page: Page number; only used to seek (via OFFSET) when no cursor is given
+        after: Cursor of the previous page's last movie (Next link)
+        before: Cursor of the next page's first movie (Prev link)
+        per_page: Movies per page
+        version: Catalog version keying the cached total
+    """
+    if sort_by not in SORT_COLUMNS:
+        sort_by = DEFAULT_SORT
+    columns = SORT_COLUMNS[sort_by]
+    query = Movie.query
+    if genre:
+        query = filter_by_genre(query, genre)
+
+    items, page, has_prev, has_next = _seek(query, columns, page, after, before, per_page)
+    total = count_cache.get(version, genre)
+    return BrowsePage(items, page, per_page, total, columns, has_prev, has_next)
+
+
+def watchlist_page(user_id, page=1, after=None, before=None, per_page=20):
+    """One page of a user's watchlist entries, newest first, with their movies loaded.
+
+    Entries and movies come from one joined query and the total from an
+    index-only count, so the page costs the same number of queries however
+    long the watchlist is. Arguments are as for browse_movies().
+    """
+    query = Watchlist.query.filter(Watchlist.user_id == user_id).options(joinedload(Watchlist.movie))
+    items, page, has_prev, has_next = _seek(query, WATCHLIST_COLUMNS, page, after, before, per_page)
+    total = db.session.query(func.count(Watchlist.id)).filter(Watchlist.user_id == user_id).scalar()
+    return BrowsePage(items, page, per_page, total, WATCHLIST_COLUMNS, has_prev, has_next)
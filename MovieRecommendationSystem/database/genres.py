@@ -0,0 +1,125 @@
+"""Normalized genres: parsing, association upkeep and the cached genre list.
+
+Movie.genres stays a space-separated display string (it also feeds the
+recommender text), while the genres / movie_genres tables hold one row per
+genre and per movie-genre pair, so filters are exact indexed joins and
+"Fiction" never matches "Science Fiction".
+"""
+import threading
+
+from sqlalchemy import func
+
+from database.db import db
+from database.models import Genre, Movie, movie_genres
+
+# TMDB genre names containing spaces; everything else in a flat string is one word per genre
+MULTI_WORD_GENRES = ('Science Fiction', 'TV Movie')
+
+
+def split_genres(genres):
+    """Split a space-separated genre string into genre names, keeping multi-word genres whole."""
+    if not genres:
+        return []
+    words = genres.split()
+    names = []
+    i = 0
+    while i < len(words):
+        for multi in MULTI_WORD_GENRES:
+            parts = multi.split()
+            if [w.lower() for w in words[i:i + len(parts)]] == [p.lower() for p in parts]:
+                names.append(multi)
+                i += len(parts)
+                break
+        else:
+            names.append(words[i])
+            i += 1
+    # Keep first occurrence order, drop repeats
+    return list(dict.fromkeys(names))
+
+
+class GenreRegistry:
+    """Genre rows by name for one load, creating missing ones on first use."""
+
+    def __init__(self):
+        self._by_name = {genre.name: genre for genre in Genre.query.all()}
+
+    def get(self, name):
+        genre = self._by_name.get(name)
+        if genre is None:
+            genre = Genre(name=name)
+            db.session.add(genre)
+            self._by_name[name] = genre
+        return genre
+
+    def genres_for(self, names):
+        return [self.get(name) for name in names]
+
+
+def backfill_movie_genres(batch_size=5000):
+    """Populate movie_genres from Movie.genres for catalogs loaded before the table existed.
+
+    Only runs when the association table is empty, so it costs one query on
+    an up-to-date database. Returns the number of association rows written.
+    """
+    if db.session.query(movie_genres.c.movie_id).first() is not None:
+        return 0
+    rows = db.session.query(Movie.id, Movie.genres).filter(Movie.genres.isnot(None), Movie.genres != '').all()
+    if not rows:
+        return 0
+
+    registry = GenreRegistry()
+    names_by_movie = [(movie_id, split_genres(genres)) for movie_id, genres in rows]
+    for _, names in names_by_movie:
+        registry.genres_for(names)
+    db.session.flush()
+
+    links = [{'movie_id': movie_id, 'genre_id': registry.get(name).id}
+             for movie_id, names in names_by_movie for name in names]
+    for start in range(0, len(links), batch_size):
+        db.session.execute(movie_genres.insert(), links[start:start + batch_size])
+    db.session.commit()
+    print(f"Backfilled {len(links)} movie genres")
+    return len(links)
+
+
+def filter_by_genre(query, name):
+    """Restrict a Movie query to one genre through the (genre_id, movie_id) index."""
+    return query.join(movie_genres, movie_genres.c.movie_id == Movie.id).join(
+        Genre, Genre.id == movie_genres.c.genre_id
+    ).filter(Genre.name == name)
+
+
+class GenreListCache:
+    """Genre names with movie counts, recomputed only when the catalog version changes."""
+
+    def __init__(self):
+        # (version, genres) swapped as one reference, so readers never see a mismatched pair
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def get(self, version):
+        """Return [(name, movie_count), ...] sorted by name for catalog `version`.
+
+        A None version (catalog not fingerprinted yet) is never cached.
+        """
+        entry = self._entry
+        if entry is not None and version is not None and entry[0] == version:
+            return entry[1]
+        with self._lock:
+            entry = self._entry
+            if entry is None or version is None or entry[0] != version:
+                genres = [
+                    (name, count) for name, count in db.session.query(
+                        Genre.name, func.count(movie_genres.c.movie_id)
+                    ).join(movie_genres, movie_genres.c.genre_id == Genre.id).group_by(
+                        Genre.id
+                    ).order_by(Genre.name)
+                ]
+                entry = self._entry = (version, genres)
+            return entry[1]
+
+    def clear(self):
+        self._entry = None
+
+
+genre_list_cache = GenreListCache()
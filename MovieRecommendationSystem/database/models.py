@@ -41,12 +41,52 @@ class Movie(db.Model):
     
     # For recommendation engine
     combined_features = db.Column(db.Text)
+    # Catalog revision of the last insert or update, stamped by triggers (database/revision.py)
+    revision = db.Column(db.Integer, index=True)
     
     watchlist_entries = db.relationship('Watchlist', backref='movie', lazy=True)
+    genre_entries = db.relationship('Genre', secondary='movie_genres', backref='movies', lazy=True)
+    
+    # One per browse sort order (database/browse.py), with id as the keyset tiebreaker
+    __table_args__ = (
+        db.Index('ix_movies_popularity_id', 'popularity', 'id'),
+        db.Index('ix_movies_rating_id', 'vote_average', 'vote_count', 'id'),
+        db.Index('ix_movies_release_date_id', 'release_date', 'id'),
+    )
     
     def __repr__(self):
         return f'<Movie {self.title}>'
 
+# Movie <-> genre association. The primary key serves lookups by movie, the
+# (genre_id, movie_id) index serves genre filters as an index-only join.
+movie_genres = db.Table(
+    'movie_genres',
+    db.Column('movie_id', db.Integer, db.ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_movie_genres_genre_movie', 'genre_id', 'movie_id'),
+)
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<Genre {self.name}>'
+
+class CatalogRevision(db.Model):
+    """Single row counting changes to the movies table (see database/revision.py)."""
+    __tablename__ = 'catalog_revision'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    # Unix time of the last change, in whole seconds
+    changed_at = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CatalogRevision {self.revision}>'
+
 class Watchlist(db.Model):
     __tablename__ = 'watchlist'
     
@@ -56,7 +96,31 @@ class Watchlist(db.Model):
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
     watched = db.Column(db.Boolean, default=False)
     
-    __table_args__ = (db.UniqueConstraint('user_id', 'movie_id', name='unique_user_movie'),)
+    # The unique constraint serves membership checks, the index the newest-first watchlist page
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'movie_id', name='unique_user_movie'),
+        db.Index('ix_watchlist_user_added_id', 'user_id', 'added_at', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<Watchlist User:{self.user_id} Movie:{self.movie_id}>'
+
+
+class UserRecommendation(db.Model):
+    """Recommendations precomputed offline by `python -m recommender precompute`."""
+    __tablename__ = 'user_recommendations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movies.id'), nullable=False)
+    score = db.Column(db.Float)
+    # Watchlist the rows were computed from; a mismatch means they are stale
+    watchlist_digest = db.Column(db.String(16), nullable=False)
+    engine_version = db.Column(db.String(32))
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('user_id', 'rank', name='unique_user_rank'),)
     
     def __repr__(self):
-        return f'<Watchlist User:{self.user_id} Movie:{self.movie_id}>'
\ No newline at end of file
+        return f'<UserRecommendation User:{self.user_id} #{self.rank} Movie:{self.movie_id}>'
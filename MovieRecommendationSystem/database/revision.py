@@ -0,0 +1,78 @@
+"""Catalog revision: a counter that changes whenever any movie row does.
+
+The single catalog_revision row is bumped by load_movies_to_db after every
+ETL load and, on SQLite, by triggers on movies, so any insert, delete or
+edit of any column (a retitled movie, a new poster path), from the app, the
+ETL or a plain SQL client, moves it forward. Reading it is one primary-key
+lookup, cheap enough to do on every request.
+
+The same triggers stamp each inserted or updated movie with the revision
+that changed it (movies.revision), so the recommender can fetch just the
+rows changed since the revision it was built from (see changed_since()).
+"""
+import time
+
+from sqlalchemy import inspect, text
+
+from database.db import db
+from database.models import CatalogRevision, Movie
+
+BUMP = (
+    "UPDATE catalog_revision SET revision = revision + 1, "
+    "changed_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = 1"
+)
+STAMP = "UPDATE movies SET revision = (SELECT revision FROM catalog_revision WHERE id = 1) WHERE id = NEW.id"
+# Trigger name -> (event, statements). The update trigger skips the stamping update itself.
+TRIGGERS = {
+    'movies_revision_insert': ('AFTER INSERT ON movies', (BUMP, STAMP)),
+    'movies_revision_update': ('AFTER UPDATE ON movies WHEN NEW.revision IS OLD.revision', (BUMP, STAMP)),
+    'movies_revision_delete': ('AFTER DELETE ON movies', (BUMP,)),
+}
+
+
+def revision_tracking():
+    """True when triggers keep movies.revision current, so changed_since() sees every change."""
+    return db.engine.dialect.name == 'sqlite'
+
+
+def ensure_catalog_revision():
+    """Create the revision row and, on SQLite, the movies.revision column and the triggers."""
+    if db.session.get(CatalogRevision, 1) is None:
+        db.session.add(CatalogRevision(id=1, revision=0, changed_at=int(time.time())))
+        db.session.commit()
+    if not revision_tracking():
+        return
+    if 'revision' not in {column['name'] for column in inspect(db.engine).get_columns('movies')}:
+        # Movies tables created before the column; NULL reads as "older than any engine"
+        db.session.execute(text("ALTER TABLE movies ADD COLUMN revision INTEGER"))
+        db.session.commit()
+    for index in Movie.__table__.indexes:
+        if 'revision' in index.columns.keys():
+            index.create(db.engine, checkfirst=True)
+    # Recreated on every start, so trigger bodies follow this module
+    for name, (event, statements) in TRIGGERS.items():
+        db.session.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        db.session.execute(text(f"CREATE TRIGGER {name} {event} BEGIN {'; '.join(statements)}; END"))
+    db.session.commit()
+
+
+def bump_catalog_revision():
+    """Record a catalog change; for writers on databases without the triggers."""
+    updated = CatalogRevision.query.filter_by(id=1).update({
+        CatalogRevision.revision: CatalogRevision.revision + 1,
+        CatalogRevision.changed_at: int(time.time()),
+    }, synchronize_session=False)
+    if not updated:
+        db.session.add(CatalogRevision(id=1, revision=1, changed_at=int(time.time())))
+    db.session.commit()
+
+
+def catalog_revision():
+    """(revision, changed_at unix seconds) of the movies table, or (0, 0) before the row exists."""
+    row = db.session.query(CatalogRevision.revision, CatalogRevision.changed_at).filter_by(id=1).first()
+    return (row[0], row[1]) if row is not None else (0, 0)
+
+
+def changed_since(revision):
+    """Filter for movies inserted or updated after catalog `revision` (needs revision_tracking())."""
+    return Movie.revision > revision
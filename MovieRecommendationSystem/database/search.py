@@ -0,0 +1,150 @@
+"""SQLite FTS5 index behind /search.
+
+`movies_fts` holds each movie's title and overview with rowids assigned in
+popularity order (rowid 1 is the most popular movie). A search scans the
+matching rows in rowid order and stops after `candidates` of them, so even
+a one-letter prefix over a million titles reads a bounded number of rows;
+those candidates are then ordered by a blend of title relevance (does the
+title start with the query, is it an exact match, how long is it) and
+popularity. FTS5's bm25() is not used: it counts every document matching
+each term, which for a short prefix is most of the catalog. Because rowids
+encode popularity, the index is rebuilt as a whole (rebuild_search_index)
+at the end of every ETL load rather than patched row by row.
+
+On databases other than SQLite, or SQLite builds without FTS5, search
+falls back to the original ILIKE title scan.
+"""
+import math
+import re
+import unicodedata
+
+from sqlalchemy import text
+
+from database.db import db
+from database.models import Movie
+
+# unicode61 with diacritics removed, so "amelie" finds "Amélie"; prefix indexes make
+# 1-3 character prefix queries a single doclist lookup
+CREATE_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5("
+    "movie_id UNINDEXED, popularity UNINDEXED, title, overview, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')"
+)
+# Weight of log(1 + popularity) against title relevance (0-3) when ordering candidates
+POPULARITY_WEIGHT = 0.25
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+# Per database URL: whether FTS5 search can be used
+_available = {}
+
+
+def search_index_available():
+    """True when the database is SQLite with FTS5 and the index table exists."""
+    url = str(db.engine.url)
+    if url not in _available:
+        if db.engine.dialect.name != 'sqlite':
+            _available[url] = False
+        else:
+            try:
+                db.session.execute(text(CREATE_FTS))
+                db.session.commit()
+                _available[url] = True
+            except Exception as e:
+                db.session.rollback()
+                print(f"Full-text search unavailable, using LIKE search: {e}")
+                _available[url] = False
+    return _available[url]
+
+
+def rebuild_search_index():
+    """Re-index every movie, numbering rowids by popularity. Returns the number of rows indexed."""
+    if not search_index_available():
+        return 0
+    db.session.execute(text("DELETE FROM movies_fts"))
+    db.session.execute(text(
+        "INSERT INTO movies_fts (rowid, movie_id, popularity, title, overview) "
+        "SELECT row_number() OVER (ORDER BY popularity DESC, id), id, popularity, title, coalesce(overview, '') "
+        "FROM movies"
+    ))
+    db.session.commit()
+    count = db.session.execute(text("SELECT max(rowid) FROM movies_fts")).scalar() or 0
+    print(f"Search index rebuilt with {count} movies")
+    return count
+
+
+def ensure_search_index():
+    """Build the index if it does not cover the catalog (e.g. first start after upgrading)."""
+    if not search_index_available():
+        return
+    indexed = db.session.execute(text("SELECT max(rowid) FROM movies_fts")).scalar() or 0
+    if indexed != db.session.query(Movie.id).count():
+        rebuild_search_index()
+
+
+def fold(text):
+    """Lowercase and strip accents, matching the index tokenizer ("Amélie" -> "amelie")."""
+    if text.isascii():
+        # Nothing to decompose; most titles take this path when candidates are ranked
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def match_expression(query, include_overview=False):
+    """FTS5 MATCH expression for user input: every word must match, the last one as a prefix.
+
+    Words are quoted, so FTS5 operators typed by the user are taken literally.
+    Returns None when the input has no word characters.
+    """
+    words = _TOKEN.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    if include_overview:
+        return ' '.join(terms)
+    return ' '.join(f'title : {term}' for term in terms)
+
+
+def title_relevance(title, words):
+    """How well a title matches folded query words, the last one a prefix: about -1 to 3."""
+    title_words = _TOKEN.findall(fold(title or ''))
+    head = title_words[:len(words)]
+    starts = (len(head) == len(words) and head[:-1] == words[:-1]
+              and head[-1].startswith(words[-1]))
+    in_title = all(word in title_words for word in words[:-1]) and any(
+        title_word.startswith(words[-1]) for title_word in title_words)
+    score = 2.0 if starts else 1.0 if in_title else 0.0
+    if title_words == words:
+        score += 1.0
+    # Prefer shorter titles: "Alien" before "Alien vs. Predator: Requiem"
+    return score - 0.1 * len(title_words)
+
+
+def search_movies(query, limit=10, include_overview=False, candidates=200):
+    """Movies matching `query`, best first, or None if full-text search is unavailable.
+
+    Args:
+        query: Raw user input, e.g. the partial title typed so far
+        limit: Number of movies to return
+        include_overview: Also match words in overviews (ranked below title matches)
+        candidates: Most popular matches considered for ranking
+    """
+    if not search_index_available():
+        return None
+    expression = match_expression(query, include_overview)
+    if expression is None:
+        return []
+
+    rows = db.session.execute(text(
+        "SELECT movie_id, popularity, title FROM movies_fts "
+        "WHERE movies_fts MATCH :expression ORDER BY rowid LIMIT :candidates"
+    ), {'expression': expression, 'candidates': candidates}).all()
+    if not rows:
+        return []
+
+    words = _TOKEN.findall(fold(query))
+    ranked = sorted(rows, key=lambda row: title_relevance(row[2], words)
+                    + POPULARITY_WEIGHT * math.log1p(max(row[1] or 0, 0)), reverse=True)
+    top_ids = [movie_id for movie_id, _, _ in ranked[:limit]]
+    by_id = {m.id: m for m in Movie.query.filter(Movie.id.in_(top_ids)).all()}
+    return [by_id[movie_id] for movie_id in top_ids if movie_id in by_id]
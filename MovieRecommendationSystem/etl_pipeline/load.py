@@ -1,29 +1,36 @@
+from database.browse import sort_value
 from database.db import db
+from database.genres import GenreRegistry, split_genres
 from database.models import Movie
+from database.revision import bump_catalog_revision
+from database.search import rebuild_search_index
 
 def load_movies_to_db(df, app):
     """Load transformed movies into the database"""
     with app.app_context():
         inserted = 0
         updated = 0
+        genres = GenreRegistry()
         
         for _, row in df.iterrows():
             try:
+                names = row['genre_names'] if 'genre_names' in row else split_genres(row['genres'])
                 existing = Movie.query.filter_by(tmdb_id=row['tmdb_id']).first()
                 
                 if existing:
-                    # Update existing movie
+                    # Update existing movie; sort columns never get NULL, which keyset pages skip
                     existing.title = row['title']
                     existing.overview = row['overview']
                     existing.genres = row['genres']
-                    existing.release_date = row['release_date']
-                    existing.vote_average = row['vote_average']
-                    existing.vote_count = row['vote_count']
-                    existing.popularity = row['popularity']
+                    existing.release_date = sort_value(Movie.release_date, row['release_date'])
+                    existing.vote_average = sort_value(Movie.vote_average, row['vote_average'])
+                    existing.vote_count = sort_value(Movie.vote_count, row['vote_count'])
+                    existing.popularity = sort_value(Movie.popularity, row['popularity'])
                     existing.poster_path = row['poster_path']
                     existing.backdrop_path = row['backdrop_path']
                     existing.original_language = row['original_language']
                     existing.combined_features = row['combined_features']
+                    existing.genre_entries = genres.genres_for(names)
                     updated += 1
                 else:
                     # Insert new movie
@@ -32,15 +39,16 @@ def load_movies_to_db(df, app):
                         title=row['title'],
                         overview=row['overview'],
                         genres=row['genres'],
-                        release_date=row['release_date'],
-                        vote_average=row['vote_average'],
-                        vote_count=row['vote_count'],
-                        popularity=row['popularity'],
+                        release_date=sort_value(Movie.release_date, row['release_date']),
+                        vote_average=sort_value(Movie.vote_average, row['vote_average']),
+                        vote_count=sort_value(Movie.vote_count, row['vote_count']),
+                        popularity=sort_value(Movie.popularity, row['popularity']),
                         poster_path=row['poster_path'],
                         backdrop_path=row['backdrop_path'],
                         original_language=row['original_language'],
                         combined_features=row['combined_features']
                     )
+                    movie.genre_entries = genres.genres_for(names)
                     db.session.add(movie)
                     inserted += 1
                 
@@ -51,8 +59,14 @@ def load_movies_to_db(df, app):
             except Exception as e:
                 print(f"Error loading movie {row['tmdb_id']}: {e}")
                 db.session.rollback()
+                # The rollback may have discarded genres created since the last commit
+                genres = GenreRegistry()
                 continue
         
         db.session.commit()
+        # SQLite triggers already counted each row; other databases only see this bump
+        bump_catalog_revision()
+        # Rowids follow popularity, which a load changes for every movie: re-index in one statement
+        rebuild_search_index()
         print(f"\nLoad complete: {inserted} inserted, {updated} updated")
         return inserted, updated
\ No newline at end of file
@@ -13,6 +13,7 @@ from etl_pipeline.load import load_movies_to_db
 from config import Config
 from flask import Flask
 from database.db import db, init_db
+from profiler import profile_stage
 
 def run_etl_pipeline(source='tmdb', pages=5, **kwargs):
     """
@@ -57,33 +58,37 @@ def run_etl_pipeline(source='tmdb', pages=5, **kwargs):
     with app.app_context():
         db.create_all()
     
+    # Stages are profiled into PROFILE_DIR when PROFILE_ETL is set
+    profile_dir = Config.PROFILE_DIR if Config.PROFILE_ETL else None
+    
     # Extract
     print(f"\n[1/3] EXTRACTING DATA FROM {source.upper()}...")
     all_movies = []
     
-    if source.lower() == 'tmdb':
-        api_key = Config.TMDB_API_KEY
+    with profile_stage('etl-extract', profile_dir):
+        if source.lower() == 'tmdb':
+            api_key = Config.TMDB_API_KEY
+            
+            if not api_key or api_key == 'your_tmdb_api_key_here':
+                print("ERROR: Please set your TMDB API key in config.py or environment variable")
+                return
+            
+            popular_movies = fetch_popular_movies(api_key, pages=pages)
+            top_rated_movies = fetch_top_rated_movies(api_key, pages=3)
+            all_movies = popular_movies + top_rated_movies
         
-        if not api_key or api_key == 'your_tmdb_api_key_here':
-            print("ERROR: Please set your TMDB API key in config.py or environment variable")
-            return
+        elif source.lower() == 'kaggle':
+            dataset_name = kwargs.get('dataset_name', 'tmdb-movie-metadata')
+            csv_file_name = kwargs.get('csv_file_name', 'tmdb_5000_movies.csv')
+            all_movies = fetch_movies_from_kaggle(dataset_name, csv_file_name)
         
-        popular_movies = fetch_popular_movies(api_key, pages=pages)
-        top_rated_movies = fetch_top_rated_movies(api_key, pages=3)
-        all_movies = popular_movies + top_rated_movies
-    
-    elif source.lower() == 'kaggle':
-        dataset_name = kwargs.get('dataset_name', 'tmdb-movie-metadata')
-        csv_file_name = kwargs.get('csv_file_name', 'tmdb_5000_movies.csv')
-        all_movies = fetch_movies_from_kaggle(dataset_name, csv_file_name)
-    
-    elif source.lower() == 'csv':
-        csv_path = kwargs.get('csv_path', 'movies.csv')
-        all_movies = fetch_movies_from_csv(csv_path)
-    
-    else:
-        print(f"ERROR: Unknown source '{source}'. Use 'tmdb', 'kaggle', or 'csv'")
-        return
+        elif source.lower() == 'csv':
+            csv_path = kwargs.get('csv_path', 'movies.csv')
+            all_movies = fetch_movies_from_csv(csv_path)
+        
+        else:
+            print(f"ERROR: Unknown source '{source}'. Use 'tmdb', 'kaggle', or 'csv'")
+            return
     
     if not all_movies:
         print("ERROR: No movies extracted. Check your data source configuration.")
@@ -93,11 +98,13 @@ def run_etl_pipeline(source='tmdb', pages=5, **kwargs):
     
     # Transform
     print("\n[2/3] TRANSFORMING DATA...")
-    transformed_df = transform_movies(all_movies)
+    with profile_stage('etl-transform', profile_dir):
+        transformed_df = transform_movies(all_movies)
     
     # Load
     print("\n[3/3] LOADING DATA TO DATABASE...")
-    inserted, updated = load_movies_to_db(transformed_df, app)
+    with profile_stage('etl-load', profile_dir):
+        inserted, updated = load_movies_to_db(transformed_df, app)
     
     print("\n" + "="*50)
     print("ETL Pipeline Complete!")
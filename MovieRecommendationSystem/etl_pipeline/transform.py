@@ -1,5 +1,7 @@
+import json
 import pandas as pd
 import re
+from database.genres import split_genres
 
 def clean_text(text):
     """Clean text data"""
@@ -10,11 +12,19 @@ def clean_text(text):
     text = ' '.join(text.split())
     return text
 
-def extract_genres(genre_list):
-    """Extract genre names from genre objects"""
-    if isinstance(genre_list, list):
-        return ' '.join([g['name'] for g in genre_list if 'name' in g])
-    return ""
+def genre_names(raw_genres):
+    """List of genre names from genre objects, a JSON string of them, or a space-separated string"""
+    if isinstance(raw_genres, list):
+        return [g['name'] if isinstance(g, dict) else str(g) for g in raw_genres
+                if not isinstance(g, dict) or 'name' in g]
+    if isinstance(raw_genres, str):
+        if raw_genres.startswith('['):
+            try:
+                return genre_names(json.loads(raw_genres))
+            except ValueError:
+                return []
+        return split_genres(raw_genres)
+    return []
 
 def transform_movies(raw_movies):
     """Transform raw movie data into clean format"""
@@ -22,9 +32,10 @@ def transform_movies(raw_movies):
     
     for movie in raw_movies:
         try:
-            genres = ""
+            names = []
             if 'genres' in movie:
-                genres = extract_genres(movie['genres'])
+                # API objects, or the strings CSV and Kaggle extraction produce
+                names = genre_names(movie['genres'])
             elif 'genre_ids' in movie:
                 # Map genre IDs to names
                 genre_map = {
@@ -34,7 +45,8 @@ def transform_movies(raw_movies):
                     9648: 'Mystery', 10749: 'Romance', 878: 'Science Fiction',
                     10770: 'TV Movie', 53: 'Thriller', 10752: 'War', 37: 'Western'
                 }
-                genres = ' '.join([genre_map.get(gid, '') for gid in movie.get('genre_ids', [])])
+                names = [genre_map[gid] for gid in movie.get('genre_ids', []) if gid in genre_map]
+            genres = ' '.join(names)
             
             overview = clean_text(movie.get('overview', ''))
             title = clean_text(movie.get('title', ''))
@@ -48,6 +60,7 @@ def transform_movies(raw_movies):
                 'title': movie.get('title', 'Unknown'),
                 'overview': movie.get('overview', ''),
                 'genres': genres,
+                'genre_names': names,
                 'release_date': movie.get('release_date', ''),
                 'vote_average': movie.get('vote_average', 0.0),
                 'vote_count': movie.get('vote_count', 0),
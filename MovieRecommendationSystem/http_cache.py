@@ -0,0 +1,119 @@
+"""HTTP caching: conditional GET for catalog pages and Cache-Control per blueprint.
+
+Catalog pages (browse, movie detail, search) only change when the catalog
+does, so views decorated with @conditional get an ETag built from the
+catalog revision read when the request is served (see database/revision.py:
+any insert, edit or delete of a movie row advances it), the engine version
+(similar movies and the title index), the URL and, for logged-in users, the
+user id, which the page header shows. Last-Modified is the time of the
+latest revision. A request whose If-None-Match (or If-Modified-Since) still
+matches gets an empty 304 before the view runs any template.
+
+Cache-Control is set per blueprint after each GET:
+
+    movies   public, max-age=HTTP_CACHE_MAX_AGE for anonymous visitors;
+             private, no-cache once a user is logged in or a flash is pending
+    user     private, no-cache (watchlist, recommendations, per-user JSON)
+    auth     no-store (login and signup forms)
+
+Public responses carry `Vary: Cookie`, so a shared cache never hands an
+anonymous page to a logged-in user. Responses that already set
+Cache-Control, and blueprint-less endpoints (/metrics, static files), are
+left alone.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import g, make_response, request, session
+from flask_login import current_user
+
+from database.revision import catalog_revision
+from recommender.manager import engine_manager
+
+PRIVATE = 'private, no-cache'
+NO_STORE = 'no-store'
+# Blueprints whose pages are the same for every visitor; 'public' is resolved per request
+BLUEPRINT_POLICIES = {'movies': 'public', 'user': PRIVATE, 'auth': NO_STORE}
+
+
+def _personal():
+    """True when the rendered page depends on the session: a logged-in user or a pending flash."""
+    return current_user.is_authenticated or bool(session.get('_flashes'))
+
+
+def catalog_etag(revision, *parts):
+    """Weak ETag value for catalog `revision`, the request URL and `parts`."""
+    raw = '|'.join(str(part) for part in (revision, request.full_path) + parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+def conditional(engine=False):
+    """Serve a view with catalog validators and answer matching conditional GETs with 304.
+
+    Args:
+        engine: The view also depends on the recommendation engine, so its
+            version is part of the ETag
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Also schedules the refit check that keeps similar movies and the title index current
+            recommendation_engine = engine_manager.get()
+            # A flash must be rendered (and consumed)
+            if session.get('_flashes'):
+                return view(*args, **kwargs)
+            revision, changed_at = catalog_revision()
+
+            parts = []
+            if engine:
+                parts.append(recommendation_engine.version if recommendation_engine else None)
+            if current_user.is_authenticated:
+                parts.append(f'user:{current_user.get_id()}')
+            etag = catalog_etag(revision, *parts)
+            last_modified = datetime.fromtimestamp(changed_at, timezone.utc)
+
+            if request.if_none_match:
+                fresh = request.if_none_match.contains_weak(etag)
+            else:
+                fresh = request.if_modified_since is not None and last_modified <= request.if_modified_since
+            if fresh:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    """Register the per-blueprint Cache-Control policies."""
+    max_age = app.config.get('HTTP_CACHE_MAX_AGE', 60)
+
+    @app.before_request
+    def note_personal():
+        # Decided up front: rendering pops pending flashes from the session
+        if BLUEPRINT_POLICIES.get(request.blueprint) == 'public':
+            g.cache_personal = _personal()
+
+    @app.after_request
+    def set_cache_control(response):
+        policy = BLUEPRINT_POLICIES.get(request.blueprint)
+        if (policy is None or request.method not in ('GET', 'HEAD')
+                or 'Cache-Control' in response.headers):
+            return response
+        if policy == 'public':
+            if g.get('cache_personal', True):
+                policy = PRIVATE
+            elif response.status_code not in (200, 304):
+                # Errors (e.g. a 404 for a movie about to be loaded) are not worth keeping
+                policy = 'no-cache'
+            else:
+                policy = f'public, max-age={max_age}' if max_age > 0 else 'public, no-cache'
+            response.vary.add('Cookie')
+        response.headers['Cache-Control'] = policy
+        return response
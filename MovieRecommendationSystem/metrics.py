@@ -0,0 +1,239 @@
+"""Process-local metrics exposed at /metrics in the Prometheus text format.
+
+Counters and histograms are plain in-memory structures updated under a
+per-metric lock; an observation is a dict lookup, a bisect and two adds, so
+instrumenting hot paths costs about a microsecond. Values that already live
+elsewhere (cache counters, catalog size, model memory) are read through a
+callback at scrape time instead of being mirrored.
+
+Every worker process keeps its own values, so under gunicorn each worker
+must be scraped (or run a single worker) to see the full picture.
+"""
+import bisect
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, request
+from sqlalchemy import event
+
+# Seconds; fine-grained at the low end, where similarity lookups and SQL queries sit
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _samples(self):
+        """(suffix, label values, extra labels, value) tuples for render()."""
+        if self.function is not None:
+            return [('', (), (), self.function())]
+        with self._lock:
+            return [('', labels, (), value) for labels, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, labels, extra, value in self._samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labelnames, labels, extra)} '
+                         f'{_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count, either incremented in place or read from `function`."""
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """Current value, either set in place or read from `function`."""
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """Distribution of durations in seconds over fixed cumulative buckets."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _samples(self):
+        with self._lock:
+            entries = [(labels, list(counts), total, count)
+                       for labels, (counts, total, count) in sorted(self._values.items())]
+        samples = []
+        for labels, counts, total, count in entries:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', labels, (('le', _format_value(bound)),), cumulative))
+            samples.append(('_sum', labels, (), total))
+            samples.append(('_count', labels, (), count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time spent handling requests, by endpoint',
+    ('endpoint', 'method', 'status')))
+SQL_DURATION = registry.register(Histogram(
+    'sql_query_duration_seconds', 'Time spent executing SQL statements, by statement type',
+    ('statement',)))
+FIT_DURATION = registry.register(Histogram(
+    'recommender_fit_duration_seconds', 'Time spent building a recommendation engine, by kind',
+    ('kind',)))
+SIMILARITY_DURATION = registry.register(Histogram(
+    'recommender_similarity_query_seconds', 'Time spent in similarity backend lookups, by operation',
+    ('operation',)))
+RECOMMENDATION_DURATION = registry.register(Histogram(
+    'recommendation_compute_seconds', 'Time spent computing a recommendation list on a cache miss, by source',
+    ('source',)))
+
+
+def _engine_value(read):
+    def value():
+        from recommender.manager import engine_manager
+        engine = engine_manager.engine
+        return read(engine) if engine is not None and engine.is_fitted else 0
+    return value
+
+
+def _cache_value(key):
+    def value():
+        from recommender.cache import recommendation_cache
+        return recommendation_cache.stats()[key]
+    return value
+
+
+registry.register(Counter('recommendation_cache_hits_total', 'Per-user recommendation cache hits',
+                          function=_cache_value('hits')))
+registry.register(Counter('recommendation_cache_misses_total', 'Per-user recommendation cache misses',
+                          function=_cache_value('misses')))
+registry.register(Gauge('recommendation_cache_entries', 'Users currently in the recommendation cache',
+                        function=_cache_value('size')))
+registry.register(Gauge('recommender_catalog_movies', 'Movies in the active recommendation engine',
+                        function=_engine_value(lambda engine: engine.catalog_size)))
+registry.register(Gauge('recommender_model_bytes', 'Bytes held by the active engine\'s arrays',
+                        function=_engine_value(lambda engine: engine.memory_bytes())))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+    SQL_DURATION.observe(time.perf_counter() - started, verb)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get('query_started'):
+        context.connection.info['query_started'].pop()
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        REQUEST_DURATION.observe(time.perf_counter() - started,
+                                 request.endpoint or '<unmatched>', request.method, str(response.status_code))
+    return response
+
+
+def init_app(app, db):
+    """Instrument requests and SQL of `app`, and serve the registry at /metrics.
+
+    Does nothing unless METRICS_ENABLED is set, so a disabled app pays for
+    neither the request hooks nor the SQL listeners. With METRICS_TOKEN set,
+    scrapes must send it as a bearer token.
+    """
+    if not app.config.get('METRICS_ENABLED', False):
+        return
+    token = app.config.get('METRICS_TOKEN')
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.engine, 'handle_error', _handle_error)
+
+    def metrics():
+        if token:
+            # Constant-time, like the profiler's token check
+            header = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(header.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+                abort(401)
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
@@ -0,0 +1,120 @@
+"""Opt-in cProfile capture of single requests and ETL stages.
+
+A request is profiled when it carries the profile flag (`X-Profile` header
+or `?profile=` query parameter) and is authorized, either by a value equal
+to PROFILE_TOKEN or by a logged-in user listed in PROFILE_USERS, or when it
+is picked by 1-in-PROFILE_SAMPLE_RATE sampling. Each profile is written to
+PROFILE_DIR as a pstats file, named after the time, endpoint and process:
+
+    python -m pstats profiles/20250101-120000-123456-movies.movie_detail-4242.prof
+    snakeviz profiles/...prof
+
+Without PROFILE_DIR, or with neither a token, users nor a sample rate,
+init_app registers nothing, so requests run exactly as before.
+"""
+import cProfile
+import hmac
+import itertools
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ARG = 'profile'
+
+
+def _profile_path(directory, name):
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    return os.path.join(directory, f"{stamp}-{name}-{os.getpid()}.prof")
+
+
+def _start():
+    """Start a profiler, or return None if another one is already running on this thread."""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+def _stop(profiler, path):
+    profiler.disable()
+    try:
+        profiler.dump_stats(path)
+    except OSError as e:
+        print(f"Error writing profile {path}: {e}")
+        return None
+    return path
+
+
+@contextmanager
+def profile_stage(name, directory=None):
+    """Profile the enclosed block into `directory` as `<time>-<name>-<pid>.prof`.
+
+    Does nothing when directory is empty, so call sites can wrap their
+    stages unconditionally.
+    """
+    if not directory:
+        yield
+        return
+    os.makedirs(directory, exist_ok=True)
+    profiler = _start()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            path = _stop(profiler, _profile_path(directory, name))
+            if path:
+                print(f"Profile of {name} written to {path}")
+
+
+def _authorized(flag):
+    config = current_app.config
+    token = config.get('PROFILE_TOKEN')
+    # Constant-time comparison, so response timing does not reveal the token; bytes, as
+    # compare_digest() rejects non-ASCII str
+    if token and flag and hmac.compare_digest(flag.encode('utf-8'), token.encode('utf-8')):
+        return True
+    users = config.get('PROFILE_USERS') or ()
+    return bool(users) and current_user.is_authenticated and current_user.username in users
+
+
+def init_app(app):
+    """Register the request profiling hooks if profiling is configured."""
+    directory = app.config.get('PROFILE_DIR')
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0)
+    on_demand = app.config.get('PROFILE_TOKEN') or app.config.get('PROFILE_USERS')
+    if not directory or not (sample_rate or on_demand):
+        return
+    os.makedirs(directory, exist_ok=True)
+    # next() on a shared count is atomic, so threads never pick the same sample twice
+    request_counter = itertools.count(1)
+
+    @app.before_request
+    def start_profile():
+        flag = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_ARG)
+        requested = on_demand and flag and _authorized(flag)
+        sampled = sample_rate and next(request_counter) % sample_rate == 0
+        if requested or sampled:
+            g.profiler = _start()
+            g.profile_requested = requested
+
+    @app.after_request
+    def finish_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            path = _stop(profiler, _profile_path(directory, request.endpoint or 'unmatched'))
+            if path and g.pop('profile_requested', False):
+                response.headers['X-Profile-File'] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def save_unfinished_profile(exc):
+        # Requests that never reach after_request (an exception propagating in debug mode)
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            _stop(profiler, _profile_path(directory, request.endpoint or 'unmatched'))
@@ -0,0 +1,123 @@
+"""Recommender command line tools.
+
+Usage:
+    python -m recommender build [--out DIR] [--top-k K] [--embedding-dim D] [--workers W] [--chunk-size C]
+    python -m recommender precompute [--top-n N] [--workers W] [--chunk-size C]
+"""
+import argparse
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import Config
+from database.db import db
+from database.models import CatalogRevision, Movie
+from database.revision import ensure_catalog_revision
+from recommender.artifact import save_artifact
+from recommender.batch import precompute_recommendations
+from recommender.engine import RecommendationEngine
+from recommender.manager import catalog_fingerprint
+from recommender.metadata import load_catalog_rows, stream_catalog_features
+from recommender.preprocess import MoviePreprocessor
+
+
+def create_cli_app():
+    """Minimal app for database access, without building the serving engine."""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+    with app.app_context():
+        # The catalog fingerprint reads the revision row, which may not exist yet
+        CatalogRevision.__table__.create(db.engine, checkfirst=True)
+        ensure_catalog_revision()
+    return app
+
+
+def build(out_dir, top_k, embedding_dim=0, workers=1, chunk_size=10000):
+    """Fit the model on the current catalog and write a new artifact version.
+
+    The catalog's text is streamed from the database chunk_size rows at a
+    time, so catalogs larger than memory can be built.
+    """
+    app = create_cli_app()
+    with app.app_context():
+        started = time.perf_counter()
+        version = catalog_fingerprint()
+        if db.session.query(Movie.id).first() is None:
+            print("ERROR: No movies in the database. Run the ETL pipeline first.")
+            return None
+
+        preprocessor = MoviePreprocessor().fit_stream(lambda: stream_catalog_features(chunk_size), workers=workers)
+        if embedding_dim:
+            preprocessor.fit_embedding(embedding_dim)
+        indices, scores = preprocessor.compute_neighbor_table(top_k=top_k, workers=workers)
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = save_artifact(out_dir, preprocessor, indices, scores, version)
+    print(f"Wrote artifact for catalog {version} to {path} in {time.perf_counter() - started:.2f}s")
+    return path
+
+
+def precompute(top_n, workers, chunk_size):
+    """Fit an engine on the current catalog and store recommendations for every user."""
+    app = create_cli_app()
+    with app.app_context():
+        db.create_all()
+        movies = load_catalog_rows()
+        if not movies:
+            print("ERROR: No movies in the database. Run the ETL pipeline first.")
+            return False
+
+        engine = RecommendationEngine(
+            movies=movies,
+            version=catalog_fingerprint(),
+            mode=Config.RECOMMENDER_MODE,
+            top_k=Config.RECOMMENDER_TOP_K,
+            ann_lists=Config.RECOMMENDER_ANN_LISTS or None,
+            ann_probe=Config.RECOMMENDER_ANN_PROBE,
+            embedding_dim=Config.RECOMMENDER_EMBEDDING_DIM or None,
+            build_workers=workers or os.cpu_count() or 1,
+        )
+        del movies
+        if not engine.is_fitted:
+            return False
+        precompute_recommendations(engine, top_n=top_n, workers=workers, chunk_size=chunk_size)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m recommender')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help='Build a memory-mappable model artifact')
+    build_parser.add_argument('--out', default=Config.RECOMMENDER_ARTIFACT_DIR,
+                              help='Artifact root directory (default: %(default)s)')
+    build_parser.add_argument('--top-k', type=int, default=Config.RECOMMENDER_TOP_K,
+                              help='Neighbors kept per movie (default: %(default)s)')
+    build_parser.add_argument('--embedding-dim', type=int, default=Config.RECOMMENDER_EMBEDDING_DIM,
+                              help='LSA embedding dimension, 0 for none (default: %(default)s)')
+    build_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                              help='Processes used for the build; output is identical for any '
+                                   'count (default: %(default)s)')
+    build_parser.add_argument('--chunk-size', type=int, default=10000,
+                              help='Movies streamed from the database per chunk (default: %(default)s)')
+
+    precompute_parser = commands.add_parser('precompute', help='Store recommendations for every user')
+    precompute_parser.add_argument('--top-n', type=int, default=Config.TOP_N_RECOMMENDATIONS,
+                                   help='Recommendations stored per user (default: %(default)s)')
+    precompute_parser.add_argument('--workers', type=int, default=Config.RECOMMENDER_BATCH_WORKERS or None,
+                                   help='Worker processes (default: all cores)')
+    precompute_parser.add_argument('--chunk-size', type=int, default=500,
+                                   help='Users per task and bulk insert (default: %(default)s)')
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        return 0 if build(args.out, args.top_k, args.embedding_dim, args.workers, args.chunk_size) else 1
+    if args.command == 'precompute':
+        return 0 if precompute(args.top_n, args.workers, args.chunk_size) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import copy
+
+import numpy as np
+from scipy import sparse
+
+from recommender.similarity import to_dense, top_k
+
+
+class IVFIndex:
+    """Approximate nearest neighbors by cluster probing (an inverted-file index).
+
+    Catalog vectors are partitioned into `n_lists` clusters with spherical
+    k-means. A query is scored exactly against the members of its `n_probe`
+    closest clusters only, so each lookup costs roughly n_probe / n_lists of
+    an exact scan. `n_probe` can be changed at any time: higher values raise
+    recall at the cost of latency; n_probe == n_lists is an exact search.
+
+    Works on the sparse TF-IDF matrix or on dense reduced vectors. Result rows
+    are padded with index -1 when the probed clusters hold fewer than top_n
+    movies.
+    """
+
+    def __init__(self, matrix, n_lists=None, n_probe=8, n_iter=10, sample_size=50000, seed=0):
+        self.matrix = matrix.tocsr() if sparse.issparse(matrix) else matrix
+        n_movies = self.matrix.shape[0]
+        self.n_lists = max(1, min(n_movies, n_lists or int(np.sqrt(n_movies))))
+        self.n_probe = n_probe
+
+        self.centroids = self._train(n_iter, sample_size, seed)
+        self._build_lists(self._assign(self.matrix, self.centroids))
+
+    def _build_lists(self, labels):
+        # Inverted lists: members of cluster c are list_members[list_offsets[c]:list_offsets[c + 1]]
+        self.labels = labels
+        self.list_members = np.argsort(labels, kind='stable').astype(np.int32)
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=self.n_lists))))
+
+    def with_updates(self, vectors, changed_indices):
+        """Return a new index after some rows were replaced or appended.
+
+        Changed rows are assigned to their closest existing centroid; the
+        centroids themselves are only retrained by a full rebuild.
+        """
+        changed = np.asarray(changed_indices, dtype=np.int64)
+        index = copy.copy(self)
+        index.matrix = vectors.tocsr() if sparse.issparse(vectors) else vectors
+        labels = np.concatenate([self.labels, np.zeros(vectors.shape[0] - len(self.labels), dtype=np.int64)])
+        labels[changed] = self._assign(index.matrix[changed], self.centroids)
+        index._build_lists(labels)
+        return index
+
+    def _train(self, n_iter, sample_size, seed):
+        """Spherical k-means on a row sample; returns L2-normalized float32 centroids.
+
+        The sample grows to at least n_lists rows, since every centroid is
+        seeded from a distinct sample row.
+        """
+        rng = np.random.default_rng(seed)
+        n_movies = self.matrix.shape[0]
+        sample = np.sort(rng.choice(n_movies, size=min(n_movies, max(sample_size, self.n_lists)), replace=False))
+        data = self.matrix[sample]
+        n_sample = len(sample)
+
+        centroids = to_dense(data[rng.choice(n_sample, size=self.n_lists, replace=False)]).astype(np.float32)
+        for _ in range(n_iter):
+            labels = self._assign(data, centroids)
+            one_hot = sparse.csr_matrix(
+                (np.ones(n_sample, dtype=np.float32), (labels, np.arange(n_sample))),
+                shape=(self.n_lists, n_sample)
+            )
+            sums = to_dense(one_hot @ data).astype(np.float32)
+            norms = np.linalg.norm(sums, axis=1)
+
+            # Re-seed empty clusters from random sample rows
+            empty = norms == 0
+            if empty.any():
+                sums[empty] = to_dense(data[rng.choice(n_sample, size=int(empty.sum()), replace=False)])
+                norms[empty] = np.linalg.norm(sums[empty], axis=1)
+            centroids = sums / np.maximum(norms, 1e-12)[:, np.newaxis]
+        return centroids
+
+    @staticmethod
+    def _assign(data, centroids, block_size=4096):
+        """Index of the closest centroid for every row, computed in row blocks."""
+        labels = np.empty(data.shape[0], dtype=np.int64)
+        for start in range(0, data.shape[0], block_size):
+            stop = min(start + block_size, data.shape[0])
+            labels[start:stop] = np.argmax(to_dense(data[start:stop] @ centroids.T), axis=1)
+        return labels
+
+    def neighbors(self, movie_idx, top_n):
+        """Return (indices, scores) of approximately the top_n movies most similar to movie_idx."""
+        indices, scores = self.neighbors_batch([movie_idx], top_n)
+        return indices[0], scores[0]
+
+    def neighbors_batch(self, movie_indices, top_n):
+        """Return (indices, scores) arrays shaped (len(movie_indices), top_n)."""
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        queries = self.matrix[movie_indices]
+        probed, _ = top_k(to_dense(queries @ self.centroids.T), min(self.n_probe, self.n_lists))
+
+        indices = np.full((len(movie_indices), top_n), -1, dtype=np.int32)
+        scores = np.zeros((len(movie_indices), top_n), dtype=np.float32)
+        for row, (movie_idx, lists) in enumerate(zip(movie_indices, probed)):
+            candidates = np.concatenate([
+                self.list_members[self.list_offsets[c]:self.list_offsets[c + 1]] for c in lists
+            ])
+            candidates = candidates[candidates != movie_idx]
+            if len(candidates) == 0:
+                continue
+
+            candidate_scores = to_dense(self.matrix[candidates] @ queries[row:row + 1].T).ravel()
+            best, best_scores = top_k(candidate_scores[np.newaxis, :], top_n)
+            indices[row, :best.shape[1]] = candidates[best[0]]
+            scores[row, :best.shape[1]] = best_scores[0]
+        return indices, scores
@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from scipy import sparse
+
+from recommender.preprocess import MoviePreprocessor
+
+ARTIFACT_FORMAT = 1
+CURRENT_POINTER = 'CURRENT'
+MANIFEST = 'manifest.json'
+
+
+class ModelArtifact:
+    """A recommender model loaded from an artifact directory.
+
+    Arrays are memory-mapped read-only, so every worker process that loads
+    the same artifact shares the same page-cache pages.
+    """
+
+    def __init__(self, path, manifest, preprocessor, neighbor_indices, neighbor_scores):
+        self.path = path
+        self.manifest = manifest
+        self.preprocessor = preprocessor
+        self.neighbor_indices = neighbor_indices
+        self.neighbor_scores = neighbor_scores
+
+    @property
+    def version(self):
+        """Catalog fingerprint the artifact was built from."""
+        return self.manifest['catalog_version']
+
+    @property
+    def top_k(self):
+        return self.manifest['top_k']
+
+    @property
+    def embedding_dim(self):
+        """LSA embedding dimension, or None for a TF-IDF-only artifact."""
+        return self.manifest.get('embedding_dim') or None
+
+
+def _atomic_write(path, content):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def save_artifact(root_dir, preprocessor, neighbor_indices, neighbor_scores, version):
+    """Write a versioned artifact directory and point CURRENT at it.
+
+    The directory is assembled under a temporary name and renamed into place,
+    so readers never observe a partially written artifact.
+
+    Args:
+        root_dir: Directory holding all artifact versions
+        preprocessor: Fitted MoviePreprocessor, with its LSA embedding if any
+        neighbor_indices: int32 (N, K) neighbor table
+        neighbor_scores: float32 (N, K) neighbor scores
+        version: Catalog fingerprint the model was built from
+
+    Returns:
+        Path of the new artifact directory
+    """
+    name = f"{version}-{time.strftime('%Y%m%d%H%M%S')}"
+    final_dir = os.path.join(root_dir, name)
+    tmp_dir = os.path.join(root_dir, f".{name}.tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    matrix = sparse.csr_matrix(preprocessor.tfidf_matrix, dtype=np.float32)
+    matrix.sort_indices()
+    arrays = {
+        'vocabulary': np.asarray(preprocessor.vectorizer.get_feature_names_out(), dtype=str),
+        'idf': np.asarray(preprocessor.vectorizer.idf_, dtype=np.float64),
+        'tfidf_data': matrix.data,
+        'tfidf_indices': matrix.indices.astype(np.int32),
+        'tfidf_indptr': matrix.indptr.astype(np.int64),
+        'movie_ids': preprocessor.movie_ids.astype(np.int64),
+        'id_order': preprocessor._id_order.astype(np.int64),
+        'neighbor_indices': np.ascontiguousarray(neighbor_indices, dtype=np.int32),
+        'neighbor_scores': np.ascontiguousarray(neighbor_scores, dtype=np.float32),
+    }
+    if preprocessor.embedding is not None:
+        arrays['svd_components'] = np.ascontiguousarray(preprocessor.svd_components, dtype=np.float32)
+        arrays['embedding'] = np.ascontiguousarray(preprocessor.embedding, dtype=np.float32)
+    if preprocessor.content_digests is not None:
+        arrays['content_digests'] = np.asarray(preprocessor.content_digests, dtype=np.uint32)
+    for key, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{key}.npy"), array)
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'catalog_version': version,
+        'n_movies': int(matrix.shape[0]),
+        'n_features': int(matrix.shape[1]),
+        'top_k': int(arrays['neighbor_indices'].shape[1]),
+        'embedding_dim': int(arrays['embedding'].shape[1]) if 'embedding' in arrays else 0,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(final_dir):
+        shutil.rmtree(final_dir)
+    os.rename(tmp_dir, final_dir)
+    _atomic_write(os.path.join(root_dir, CURRENT_POINTER), name)
+    return final_dir
+
+
+def current_artifact_path(root_dir):
+    """Return the artifact directory CURRENT points at, or None."""
+    pointer = os.path.join(root_dir, CURRENT_POINTER)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        name = f.read().strip()
+    path = os.path.join(root_dir, name)
+    return path if os.path.exists(os.path.join(path, MANIFEST)) else None
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def load_artifact(path, mmap=True):
+    """Load an artifact directory written by save_artifact().
+
+    Args:
+        path: Artifact directory
+        mmap: Memory-map the arrays instead of reading them into memory
+
+    Returns:
+        ModelArtifact
+    """
+    manifest = read_manifest(path)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format')} in {path}")
+
+    mmap_mode = 'r' if mmap else None
+
+    def load(key):
+        return np.load(os.path.join(path, f"{key}.npy"), mmap_mode=mmap_mode)
+
+    tfidf_matrix = sparse.csr_matrix(
+        (load('tfidf_data'), load('tfidf_indices'), load('tfidf_indptr')),
+        shape=(manifest['n_movies'], manifest['n_features']),
+        copy=False
+    )
+    has_embedding = bool(manifest.get('embedding_dim'))
+    # Artifacts written before incremental updates have no digests
+    has_digests = os.path.exists(os.path.join(path, 'content_digests.npy'))
+    preprocessor = MoviePreprocessor.from_arrays(
+        vocabulary=load('vocabulary'),
+        idf=load('idf'),
+        tfidf_matrix=tfidf_matrix,
+        movie_ids=load('movie_ids'),
+        id_order=load('id_order'),
+        svd_components=load('svd_components') if has_embedding else None,
+        embedding=load('embedding') if has_embedding else None,
+        content_digests=load('content_digests') if has_digests else None,
+    )
+    return ModelArtifact(path, manifest, preprocessor, load('neighbor_indices'), load('neighbor_scores'))
@@ -0,0 +1,163 @@
+"""In-memory title prefix index for /search autocomplete.
+
+Every title is folded (lowercase, accents stripped, punctuation dropped)
+and indexed once per word, as the suffix starting at that word, so "wars"
+and "star wa" both find *Star Wars*. Keys are fixed-width UTF-8 byte
+strings in one sorted NumPy array; a query is two binary searches for its
+range plus a selection of the most popular matches by rank. Like the FTS5
+search, those candidates are then ordered by title relevance blended with
+popularity, scoring exactly as database.search.title_relevance() but from
+per-title arrays (the folded title's first KEY_BYTES and its word count),
+so "alien" lists *Alien* before *Aliens* on both paths. Results for prefixes of up to SHORT_PREFIX bytes, whose
+ranges are the largest, are kept after their first lookup. Lookups never
+touch the database.
+"""
+import re
+
+import numpy as np
+
+from database.search import POPULARITY_WEIGHT, fold
+
+_WORD = re.compile(r'\w+')
+
+# Longer queries fall back to the database index
+KEY_BYTES = 24
+SHORT_PREFIX = 3
+
+
+def normalize(text):
+    """Folded words of `text` joined by single spaces, as UTF-8 bytes."""
+    return ' '.join(_WORD.findall(fold(text or ''))).encode('utf-8')
+
+
+def _title_keys(records, rows):
+    """Unsorted (keys, key rows) with one key per word of each title at `rows`,
+    plus (heads, word counts) of those titles in `rows` order."""
+    keys, key_rows, heads, word_counts = [], [], [], []
+    for row in rows:
+        words = normalize(records[row].title).split(b' ')
+        for start in range(len(words)):
+            if words[start]:
+                keys.append(b' '.join(words[start:])[:KEY_BYTES])
+                key_rows.append(row)
+        heads.append(b' '.join(words)[:KEY_BYTES])
+        word_counts.append(len(words) if words[0] else 0)
+    return (np.array(keys, dtype=f'S{KEY_BYTES}'), np.array(key_rows, dtype=np.int32),
+            np.array(heads, dtype=f'S{KEY_BYTES}'), np.array(word_counts, dtype=np.int16))
+
+
+class TitleIndex:
+    """Sorted word-suffix keys of every title, each tagged with its movie's popularity rank.
+
+    Args:
+        records: Objects with a title attribute (e.g. MovieRecord), returned by search()
+        popularity: Popularity per record, higher first
+        top_n: Results kept per short prefix
+        candidates: Most popular matches ordered by relevance, as in search_movies()
+    """
+
+    def __init__(self, records, popularity, top_n=10, candidates=200):
+        self.records = records
+        self.top_n = top_n
+        self.candidates = candidates
+        keys, key_rows, self.heads, self.word_counts = _title_keys(records, range(len(records)))
+        by_key = np.argsort(keys, kind='stable')
+        self.keys = keys[by_key]
+        # Record row of each key; ranks are derived from it
+        self.key_rows = key_rows[by_key]
+        self._rank(popularity)
+
+    def _rank(self, popularity):
+        popularity = np.asarray(popularity, dtype=np.float64)
+        # The popularity half of the relevance blend, per row
+        self.boost = POPULARITY_WEIGHT * np.log1p(np.maximum(popularity, 0))
+        # rank r -> record row, most popular first (ties by row)
+        self.order = np.lexsort((np.arange(len(self.records)), -popularity)).astype(np.int32)
+        rank_of_row = np.empty(len(self.records), dtype=np.int32)
+        rank_of_row[self.order] = np.arange(len(self.records), dtype=np.int32)
+        self.ranks = rank_of_row[self.key_rows]
+        # Short prefix -> top_n rows, filled on first lookup
+        self._short = {}
+
+    def with_updates(self, records, popularity, changed_rows):
+        """Return a copy for `records` in which only the titles at `changed_rows` are re-keyed.
+
+        Keys of unchanged rows are kept; the changed rows' keys are sorted
+        and merged in with one binary search, then every row is re-ranked by
+        `popularity`. Rows past the end of this index must be listed in
+        changed_rows. This index is left untouched.
+        """
+        changed_rows = np.unique(np.asarray(changed_rows, dtype=np.int64))
+        stale = np.zeros(len(records), dtype=bool)
+        stale[changed_rows] = True
+        kept = ~stale[self.key_rows]
+        keys, key_rows, heads, word_counts = _title_keys(records, changed_rows)
+        by_key = np.argsort(keys, kind='stable')
+        keys, key_rows = keys[by_key], key_rows[by_key]
+
+        index = TitleIndex.__new__(TitleIndex)
+        index.records = records
+        index.top_n = self.top_n
+        index.candidates = self.candidates
+        grow = len(records) - len(self.heads)
+        index.heads = np.concatenate([self.heads, np.zeros(grow, dtype=self.heads.dtype)])
+        index.heads[changed_rows] = heads
+        index.word_counts = np.concatenate([self.word_counts, np.zeros(grow, dtype=self.word_counts.dtype)])
+        index.word_counts[changed_rows] = word_counts
+        old_keys = self.keys[kept]
+        at = np.searchsorted(old_keys, keys, side='right')
+        index.keys = np.insert(old_keys, at, keys)
+        index.key_rows = np.insert(self.key_rows[kept], at, key_rows)
+        index._rank(popularity)
+        return index
+
+    def _top_ranks(self, lo, hi, limit):
+        """Smallest `limit` distinct ranks among keys[lo:hi]."""
+        ranks = self.ranks[lo:hi]
+        if len(ranks) > 4 * limit:
+            # A title can contribute several keys to one range; keep spare candidates for duplicates
+            best = np.unique(np.partition(ranks, 4 * limit)[:4 * limit])[:limit]
+            if len(best) == limit:
+                return best
+        return np.unique(ranks)[:limit]
+
+    def _ranked(self, prefix, limit):
+        """Rows of the best `limit` matches for folded `prefix`, by relevance and popularity."""
+        lo = np.searchsorted(self.keys, prefix, side='left')
+        # 0xff never occurs in UTF-8, so this bounds every key starting with prefix
+        hi = np.searchsorted(self.keys, prefix + b'\xff', side='left')
+        rows = self.order[self._top_ranks(lo, hi, max(limit, self.candidates))]
+        # Every candidate has a title word sequence starting with prefix, so title_relevance()
+        # reduces to: 2 if the title itself starts with it (else 1), +1 for an exact match,
+        # -0.1 per title word
+        heads = self.heads[rows]
+        starts = np.char.startswith(heads, prefix)
+        exact = (heads == prefix) & (self.word_counts[rows] == prefix.count(b' ') + 1)
+        relevance = np.where(starts, 2.0, 1.0) + exact - 0.1 * self.word_counts[rows]
+        # Stable sort over rows in popularity order: ties keep the same order as the FTS rowids
+        best = np.argsort(-(relevance + self.boost[rows]), kind='stable')[:limit]
+        return rows[best]
+
+    def __len__(self):
+        return len(self.records)
+
+    def search(self, query, limit=10):
+        """Best records with a title word sequence starting with `query`, as ordered by search_movies().
+
+        Returns:
+            List of records, or None when the query is too long for the
+            index and should be answered elsewhere
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if len(prefix) > KEY_BYTES:
+            return None
+        if len(prefix) <= SHORT_PREFIX and limit <= self.top_n:
+            rows = self._short.get(prefix)
+            if rows is None:
+                rows = self._short[prefix] = self._ranked(prefix, self.top_n)
+            rows = rows[:limit]
+        else:
+            rows = self._ranked(prefix, limit)
+        return [self.records[row] for row in rows]
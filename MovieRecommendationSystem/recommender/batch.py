@@ -0,0 +1,154 @@
+"""Offline precomputation of recommendations for every user.
+
+`python -m recommender precompute` walks the users table in id order, scores
+each chunk on a process pool and replaces the chunk's rows in
+`user_recommendations` with one bulk insert. The /recommendations route then
+serves those rows directly, and computes live only for users whose
+watchlist changed after the batch ran.
+"""
+import hashlib
+import os
+import time
+
+from database.db import db
+from database.models import Movie, User, UserRecommendation, Watchlist
+from recommender.manager import engine_manager
+from recommender.parallel import map_chunks
+
+_worker_engine = None
+
+
+def watchlist_digest(user_watchlist):
+    """Short order-independent digest of a user's (movie_id, watched) pairs."""
+    raw = ','.join(f"{movie_id}:{int(bool(watched))}" for movie_id, watched in sorted(user_watchlist))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def load_watchlist(user_id):
+    """A user's (movie_id, watched) pairs, the input of watchlist_digest() and the recommender."""
+    return db.session.query(Watchlist.movie_id, Watchlist.watched).filter(
+        Watchlist.user_id == user_id
+    ).all()
+
+
+def load_precomputed(user_id, top_n, user_watchlist=None):
+    """Return precomputed (movie, score) tuples for a user, or None if stale or missing.
+
+    Rows are stale when the user's watchlist changed since the batch ran or
+    they were scored by an engine for another catalog version than the one
+    serving now. Costs two indexed queries: the user's watchlist, to check
+    the digest (skipped when `user_watchlist` is passed in), and the stored
+    rows joined to their movies.
+    """
+    if user_watchlist is None:
+        user_watchlist = load_watchlist(user_id)
+    rows = db.session.query(
+        UserRecommendation.watchlist_digest, UserRecommendation.engine_version, UserRecommendation.score, Movie
+    ).join(
+        Movie, Movie.id == UserRecommendation.movie_id
+    ).filter(
+        UserRecommendation.user_id == user_id
+    ).order_by(UserRecommendation.rank).limit(top_n).all()
+
+    if not rows or rows[0][0] != watchlist_digest(user_watchlist):
+        return None
+    if engine_manager.version is None or rows[0][1] != engine_manager.version:
+        return None
+    return [(movie, score or 0.0) for _, _, score, movie in rows]
+
+
+def _init_worker(engine):
+    global _worker_engine
+    _worker_engine = engine
+
+
+def _recommend_chunk(args):
+    """Score one chunk of users; runs in a pool worker without database access."""
+    chunk, top_n = args
+    results = []
+    for user_id, user_watchlist in chunk:
+        recommended = _worker_engine.get_recommendations_for_watchlist(user_watchlist, top_n=top_n)
+        results.append((user_id, watchlist_digest(user_watchlist),
+                        [(movie.id, score) for movie, score in recommended]))
+    return results
+
+
+def _user_chunks(chunk_size):
+    """Yield lists of (user_id, [(movie_id, watched), ...]) in id order, one IN query per chunk."""
+    last_id = 0
+    while True:
+        user_ids = [user_id for (user_id,) in db.session.query(User.id).filter(
+            User.id > last_id
+        ).order_by(User.id).limit(chunk_size)]
+        if not user_ids:
+            return
+        last_id = user_ids[-1]
+
+        watchlists = {user_id: [] for user_id in user_ids}
+        for user_id, movie_id, watched in db.session.query(
+            Watchlist.user_id, Watchlist.movie_id, Watchlist.watched
+        ).filter(Watchlist.user_id.in_(user_ids)):
+            watchlists[user_id].append((movie_id, watched))
+        yield list(watchlists.items())
+
+
+def _write_chunk(results, engine_version):
+    """Replace the stored rows of every user in the chunk with one delete and one bulk insert."""
+    user_ids = [user_id for user_id, _, _ in results]
+    db.session.query(UserRecommendation).filter(
+        UserRecommendation.user_id.in_(user_ids)
+    ).delete(synchronize_session=False)
+
+    rows = [
+        {'user_id': user_id, 'rank': rank, 'movie_id': movie_id, 'score': float(score),
+         'watchlist_digest': digest, 'engine_version': engine_version}
+        for user_id, digest, recommended in results
+        for rank, (movie_id, score) in enumerate(recommended)
+    ]
+    if rows:
+        db.session.execute(UserRecommendation.__table__.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def precompute_recommendations(engine, top_n=10, workers=None, chunk_size=500):
+    """Compute and store top-N recommendations for every user.
+
+    The engine must hold its own metadata store (i.e. be fitted from the
+    catalog, not loaded from an artifact), so workers never query the
+    database. Must run inside an application context.
+
+    Args:
+        engine: Fitted RecommendationEngine
+        top_n: Recommendations stored per user
+        workers: Worker processes; None uses every core, 1 runs in-process
+        chunk_size: Users per task and per bulk insert
+
+    Returns:
+        Tuple (users processed, rows written)
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    n_users = n_rows = 0
+
+    def record(chunk_results):
+        nonlocal n_users, n_rows
+        n_rows += _write_chunk(chunk_results, engine.version)
+        n_users += len(chunk_results)
+        elapsed = time.perf_counter() - started
+        print(f"Precomputed {n_users} users ({n_users / elapsed:.0f} users/s)")
+
+    if workers > 1:
+        # Children must not inherit open database connections
+        db.session.close()
+        db.engine.dispose()
+    # Forked workers share the fitted engine copy-on-write
+    tasks = ((chunk, top_n) for chunk in _user_chunks(chunk_size))
+    for chunk_results in map_chunks(_recommend_chunk, tasks, workers,
+                                    initializer=_init_worker, initargs=(engine,)):
+        record(chunk_results)
+
+    elapsed = time.perf_counter() - started
+    print(f"Precompute complete: {n_users} users, {n_rows} rows in {elapsed:.2f}s "
+          f"({n_users / elapsed if elapsed else 0:.0f} users/s, {workers} workers)")
+    return n_users, n_rows
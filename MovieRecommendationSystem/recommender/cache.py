@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecommendationCache:
+    """Bounded LRU + TTL cache of per-user recommendation lists.
+
+    Entries are keyed by user id and tagged with a version: the engine
+    version plus a digest of the watchlist they were computed from. An
+    engine swap or a watchlist change therefore makes entries unreachable
+    without a sweep, in every worker process, and a request that read the
+    old watchlist cannot publish a stale result under the new one.
+    invalidate() after watchlist writes only frees the memory early; the
+    TTL bounds staleness from anything else (e.g. ratings changing the
+    popularity fill-in).
+    """
+
+    def __init__(self, max_size=10000, ttl=600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_size = app.config.get('RECOMMENDATION_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('RECOMMENDATION_CACHE_TTL', self.ttl)
+        app.extensions['recommendation_cache'] = self
+
+    def get(self, user_id, version, variant=None):
+        """Return the cached result or None.
+
+        Args:
+            user_id: User the recommendations are for
+            version: Hashable version of the inputs, e.g. (engine version, watchlist digest)
+            variant: Hashable request options (top_n, filters)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry_version, expires_at, results = entry
+                if entry_version == version and expires_at > now and variant in results:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return results[variant]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, version, variant, result):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version or entry[1] <= now:
+                entry = (version, now + self.ttl, {})
+                self._entries[user_id] = entry
+            entry[2][variant] = result
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, user_id, version, variant, compute):
+        """Return the cached result, or call compute() and cache a non-empty result."""
+        if self.max_size <= 0:
+            return compute()
+        result = self.get(user_id, version, variant)
+        if result is None:
+            result = compute()
+            if result:
+                self.set(user_id, version, variant, result)
+        return result
+
+    def invalidate(self, user_id):
+        """Drop everything cached for a user, e.g. after a watchlist change."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+            }
+
+
+recommendation_cache = RecommendationCache()
@@ -1,41 +1,249 @@
-from database.models import Movie, Watchlist
-from recommender.preprocess import MoviePreprocessor
-from sklearn.metrics.pairwise import cosine_similarity
+from database.db import db
+from database.models import Watchlist
+from recommender.ann import IVFIndex
+from recommender.artifact import load_artifact
+from recommender.autocomplete import TitleIndex
+from recommender.metadata import MovieMetadataStore, load_metadata_rows
+from recommender.preprocess import MoviePreprocessor, content_digests
+from recommender.similarity import DenseSimilarity, NeighborTable, RowScorer, top_k as select_top_k
+from metrics import SIMILARITY_DURATION
+from scipy import sparse
+import copy
 import numpy as np
 
+ENGINE_MODES = ('neighbors', 'dense', 'ondemand', 'ann')
+ARTIFACT_MODES = ('neighbors', 'ondemand')
+
+def _array_bytes(obj):
+    """Total nbytes of the NumPy arrays and sparse matrices among obj's attributes (one level of dicts)."""
+    total = 0
+    for value in vars(obj).values():
+        for item in (value.values() if isinstance(value, dict) else (value,)):
+            if isinstance(item, np.ndarray):
+                total += item.nbytes
+            elif sparse.issparse(item):
+                total += item.data.nbytes + item.indices.nbytes + item.indptr.nbytes
+    return total
+
 class RecommendationEngine:
     """Recommendation engine that provides similar movies and personalized recommendations."""
     
-    def __init__(self, index=None, movies=None):
-        self.movies = movies or []
+    def __init__(self, index=None, movies=None, version=None, mode='neighbors', top_k=50,
+                 ann_lists=None, ann_probe=8, embedding_dim=None, build_workers=1):
+        if mode not in ENGINE_MODES:
+            raise ValueError(f"Unknown recommender mode '{mode}', expected one of {ENGINE_MODES}")
+        
+        self.version = version
+        self.mode = mode
+        self.top_k = top_k
+        self.ann_lists = ann_lists
+        self.ann_probe = ann_probe
+        self.embedding_dim = embedding_dim
+        self.build_workers = build_workers
         self._preprocessor = None
+        self._store = None
         self._is_fitted = False
-        self._similarity_matrix = None
+        self._similarity = None
+        # Title prefix index for /search, built from the metadata store
+        self.title_index = None
+        # Catalog revision the engine reflects; set by the manager, bounds the next incremental patch
+        self.catalog_revision = None
         
         # Initialize if movies are provided
-        if self.movies:
-            self._fit()
+        if movies:
+            self._fit(movies)
     
-    def _fit(self):
-        """Fit the preprocessor on movies."""
-        if not self.movies:
+    def _fit(self, movies):
+        """Fit the preprocessor on movies.
+        
+        Only the metadata store is kept afterwards; the movie objects
+        themselves are not referenced by the engine.
+        """
+        if not movies:
             return
         
         try:
-            self._preprocessor = MoviePreprocessor()
-            self._preprocessor.fit(self.movies)
-            self._similarity_matrix = self._preprocessor.compute_similarity_matrix()
-            self._is_fitted = True
-            print(f"Recommendation engine fitted with {len(self.movies)} movies")
+            preprocessor = MoviePreprocessor().fit(movies, workers=self.build_workers)
+            self._build(preprocessor, MovieMetadataStore.from_movies(movies))
         except Exception as e:
             print(f"Error fitting recommendation engine: {e}")
             self._is_fitted = False
     
+    @classmethod
+    def fit_stream(cls, read_chunks, load_metadata, version=None, **options):
+        """Fit an engine from a catalog streamed in chunks.
+        
+        Peak memory is one chunk of text plus the model, instead of every
+        movie's text at once; the model is identical to a regular fit over
+        the same rows.
+        
+        Args:
+            read_chunks: Callable returning an iterator over lists of
+                (id, combined_features) rows; called twice
+            load_metadata: Callable returning metadata rows for the store
+            version: Catalog fingerprint
+            **options: Same keyword arguments as the constructor
+        """
+        engine = cls(version=version, **options)
+        try:
+            preprocessor = MoviePreprocessor().fit_stream(read_chunks, workers=engine.build_workers)
+            engine._build(preprocessor, MovieMetadataStore.aligned(load_metadata(), preprocessor.movie_ids))
+        except Exception as e:
+            print(f"Error fitting recommendation engine: {e}")
+            engine._is_fitted = False
+        return engine
+    
+    def _build(self, preprocessor, store):
+        """Build the similarity backend for a fitted preprocessor and mark the engine ready."""
+        self._preprocessor = preprocessor
+        if self.embedding_dim:
+            self._preprocessor.fit_embedding(self.embedding_dim)
+        
+        if self.mode == 'dense':
+            self._similarity = DenseSimilarity(self._preprocessor.compute_similarity_matrix())
+        elif self.mode == 'ondemand':
+            self._similarity = RowScorer(self._preprocessor.vectors)
+        elif self.mode == 'ann':
+            self._similarity = IVFIndex(self._preprocessor.vectors,
+                                        n_lists=self.ann_lists, n_probe=self.ann_probe)
+        else:
+            indices, scores = self._preprocessor.compute_neighbor_table(top_k=self.top_k,
+                                                                        workers=self.build_workers)
+            self._similarity = NeighborTable(indices, scores)
+        self._store = store
+        self.title_index = TitleIndex(store.records, store.popularity)
+        self._is_fitted = True
+        print(f"Recommendation engine fitted with {len(store)} movies ({self.mode} mode)")
+    
+    @classmethod
+    def from_artifact(cls, path, mmap=True, mode='neighbors'):
+        """Load a prebuilt engine from an artifact directory.
+        
+        The engine serves from the artifact's memory-mapped neighbor table
+        ('neighbors' mode) or scores rows of its TF-IDF matrix on demand
+        ('ondemand' mode). The metadata store and title index are built from
+        the database's metadata columns, aligned with the artifact's rows, so
+        popular lists and /search prefixes are served from memory as for a
+        fitted engine. Must run inside an application context.
+        """
+        if mode not in ARTIFACT_MODES:
+            raise ValueError(f"Artifacts cannot be served in '{mode}' mode")
+        
+        artifact = load_artifact(path, mmap=mmap)
+        engine = cls(version=artifact.version, mode=mode, top_k=artifact.top_k,
+                     embedding_dim=artifact.embedding_dim)
+        engine._preprocessor = artifact.preprocessor
+        if mode == 'ondemand':
+            engine._similarity = RowScorer(artifact.preprocessor.vectors)
+        else:
+            engine._similarity = NeighborTable(artifact.neighbor_indices, artifact.neighbor_scores)
+        engine._store = MovieMetadataStore.aligned(load_metadata_rows(), artifact.preprocessor.movie_ids)
+        engine.title_index = TitleIndex(engine._store.records, engine._store.popularity)
+        engine._is_fitted = True
+        print(f"Recommendation engine loaded from {path}")
+        return engine
+    
+    def with_updates(self, movies, version=None, max_fraction=0.1, catalog=None):
+        """Return a new engine with added or edited movies patched in.
+        
+        Movies whose combined_features changed are re-vectorized with the
+        existing vocabulary and their neighbor lists are recomputed; every
+        other list is merged against the changed rows only. The metadata
+        store and title index re-key only the given movies, so when
+        `movies` holds just the changed rows the cost grows with the size
+        of the change rather than the catalog. This engine is left untouched.
+        
+        Args:
+            movies: The full current catalog, or only the movies changed
+                since this engine was built (then pass `catalog`)
+            version: Catalog fingerprint after the change
+            max_fraction: Largest share of changed rows worth patching
+            catalog: (count, sum of ids) of the current catalog when `movies`
+                is partial; used to detect deletions
+        
+        Returns:
+            The patched engine, or None
+            when a full refit is needed instead: dense mode, deleted movies,
+            no stored content digests, or too many changes
+        """
+        if not self.is_fitted or self.mode == 'dense' or self._preprocessor.content_digests is None:
+            return None
+        
+        preprocessor = self._preprocessor
+        positions = preprocessor.get_movie_indices([movie.id for movie in movies])
+        known = positions >= 0
+        if catalog is None:
+            catalog_size = len(movies)
+            deleted = np.count_nonzero(known) < len(preprocessor.movie_ids)
+        else:
+            # Without deletions the catalog is the old rows plus the new ones
+            catalog_size = catalog[0]
+            new_ids = [movie.id for movie, is_known in zip(movies, known) if not is_known]
+            deleted = catalog != (len(preprocessor.movie_ids) + len(new_ids),
+                                  int(preprocessor.movie_ids.sum()) + sum(new_ids))
+        if deleted:
+            # Deleted movies would leave holes in every neighbor list
+            return None
+        
+        digests = content_digests(movies)
+        changed = ~known
+        changed[known] = preprocessor.content_digests[positions[known]] != digests[known]
+        changed_movies = [movie for movie, is_changed in zip(movies, changed) if is_changed]
+        
+        engine = copy.copy(self)
+        engine.version = version
+        if changed_movies:
+            if len(changed_movies) > max_fraction * catalog_size:
+                return None
+            engine._preprocessor, changed_indices = preprocessor.with_updates(changed_movies)
+            engine._similarity = self._similarity.with_updates(engine._preprocessor.vectors, changed_indices)
+        
+        if len(movies):
+            # Keep the store aligned with matrix rows; also picks up popularity and title edits
+            rows = engine._preprocessor.get_movie_indices([movie.id for movie in movies])
+            engine._store = self._store.with_updates(movies, rows)
+            engine.title_index = self.title_index.with_updates(engine._store.records, engine._store.popularity, rows)
+        print(f"Recommendation engine patched with {len(changed_movies)} changed movies "
+              f"of {len(movies)} updated ({self.mode} mode)")
+        return engine
+    
     @property
     def is_fitted(self):
         """Check if the engine is ready."""
         return self._is_fitted and self._preprocessor is not None
     
+    @property
+    def catalog_size(self):
+        """Number of movies (matrix rows) the engine serves."""
+        return len(self._preprocessor.movie_ids) if self._preprocessor is not None else 0
+    
+    def memory_bytes(self):
+        """Bytes held by the model's arrays: matrices, similarity backend, metadata columns and title index.
+        
+        Memory-mapped arrays are counted at full size even though only the
+        pages touched are resident.
+        """
+        return sum(_array_bytes(part) for part in (self._preprocessor, self._similarity, self._store, self.title_index)
+                   if part is not None)
+    
+    def _hydrate(self, indices, scores):
+        """Turn matrix row indices into (movie, score) tuples, preserving order."""
+        return self._hydrate_rows([indices], [scores])[0]
+    
+    def _hydrate_rows(self, index_rows, score_rows):
+        """Hydrate several result rows at once, one list of (movie, score) per row.
+        
+        Negative indices mark padding and are skipped. Results are MovieRecord
+        objects from the metadata store, which every fitted engine holds, so
+        hydration never queries the database.
+        """
+        return [[(self._store.record(int(idx)), float(score)) for idx, score in zip(indices, scores) if idx >= 0]
+                for indices, scores in zip(index_rows, score_rows)]
+    
+    def _popular_movies(self, exclude_ids, limit, genre=None, language=None):
+        """Most-voted movies not in exclude_ids, best first, from the store's precomputed rankings."""
+        return self._store.popular_records(exclude_ids, limit, genre=genre, language=language)
+    
     def get_similar_movies(self, movie_id, top_n=10):
         """Get similar movies based on content similarity.
         
@@ -46,39 +254,71 @@ class RecommendationEngine:
         Returns:
             List of tuples (movie, similarity_score)
         """
+        return self.get_similar_movies_batch([movie_id], top_n=top_n)[0]
+    
+    def get_similar_movies_batch(self, movie_ids, top_n=10):
+        """Get similar movies for many reference movies in one vectorized call.
+        
+        Top-K selection runs over all requested rows at once (argpartition
+        plus a sort of the K winners), and result movies are hydrated together.
+        
+        Args:
+            movie_ids: IDs of the reference movies
+            top_n: Number of similar movies to return per movie
+            
+        Returns:
+            List with one entry per movie_id, each a list of tuples
+            (movie, similarity_score); unknown movies get an empty list
+        """
+        results = [[] for _ in movie_ids]
         if not self.is_fitted:
-            return []
+            return results
         
         try:
-            # Get the index of the movie
-            movie_idx = self._preprocessor.get_movie_index(movie_id)
-            if movie_idx is None:
-                return []
-            
-            # Get similarity scores
-            similarity_scores = self._similarity_matrix[movie_idx]
+            # Get the index of each movie, skipping unknown IDs
+            positions, movie_indices = [], []
+            for pos, movie_id in enumerate(movie_ids):
+                movie_idx = self._preprocessor.get_movie_index(movie_id)
+                if movie_idx is not None:
+                    positions.append(pos)
+                    movie_indices.append(movie_idx)
+            if not movie_indices:
+                return results
             
             # Get top similar movies (excluding the movie itself)
-            similar_indices = np.argsort(similarity_scores)[::-1][1:top_n+1]
-            
-            result = []
-            for idx in similar_indices:
-                movie = self._preprocessor.get_movie_by_index(int(idx))
-                if movie:
-                    score = float(similarity_scores[idx])
-                    result.append((movie, score))
+            with SIMILARITY_DURATION.time('similar'):
+                similar_indices, similarity_scores = self._similarity.neighbors_batch(movie_indices, top_n)
             
-            return result
+            for pos, row in zip(positions, self._hydrate_rows(similar_indices, similarity_scores)):
+                results[pos] = row
+            return results
         except Exception as e:
             print(f"Error getting similar movies: {e}")
+            return [[] for _ in movie_ids]
+    
+    def get_popular_movies(self, top_n=10, genre=None, language=None, exclude_ids=None):
+        """Get the most-voted movies, optionally within one genre or language.
+        
+        Rankings are precomputed when the engine is built, so this costs the
+        same for any catalog size.
+        
+        Returns:
+            List of tuples (movie, popularity)
+        """
+        if not self.is_fitted:
             return []
+        popular_movies = self._popular_movies(set(exclude_ids or ()), top_n, genre=genre, language=language)
+        return [(m, float(m.popularity or 0)) for m in popular_movies]
     
-    def get_recommendations_for_user(self, user_id, top_n=10):
+    def get_recommendations_for_user(self, user_id, top_n=10, genre=None, language=None, user_watchlist=None):
         """Get personalized recommendations for a user based on their watchlist.
         
         Args:
             user_id: ID of the user
             top_n: Number of recommendations to return
+            genre: Optional genre for the popular movies shown to new users
+            language: Optional original_language for the popular movies shown to new users
+            user_watchlist: The user's (movie_id, watched) pairs if already loaded
             
         Returns:
             List of tuples (movie, recommendation_score)
@@ -87,61 +327,87 @@ class RecommendationEngine:
             return []
         
         try:
-            # Get user's watched movies (prioritize watched over just added)
-            watched_watchlist = Watchlist.query.filter_by(user_id=user_id, watched=True).all()
-            added_watchlist = Watchlist.query.filter_by(user_id=user_id).all()
-            
-            # Use watched movies if available, otherwise use added movies
-            user_watchlist = watched_watchlist if watched_watchlist else added_watchlist
-            
-            if not user_watchlist:
-                # Return popular movies if user has no watchlist
-                popular_movies = sorted(self.movies, 
-                        key=lambda x: (x.vote_count or 0, x.vote_average or 0), 
-                        reverse=True)[:top_n]
-                return [(m, float(m.popularity or 0)) for m in popular_movies]
-            
-            user_movie_ids = [item.movie_id for item in user_watchlist]
-            
-            # Aggregate similarity scores from all user's movies
-            aggregated_scores = np.zeros(len(self.movies))
-            
-            for user_movie_id in user_movie_ids:
-                similar_movies = self.get_similar_movies(user_movie_id, top_n=50)
-                for similar_movie, score in similar_movies:
-                    if similar_movie.id not in user_movie_ids:
-                        movie_idx = self._preprocessor.get_movie_index(similar_movie.id)
-                        if movie_idx is not None:
-                            aggregated_scores[movie_idx] += score
-            
-            # Get top recommendations (with fallback to popularity if no similarities found)
-            top_indices = np.argsort(aggregated_scores)[::-1][:top_n*2]
-            
-            result = []
-            for idx in top_indices:
-                if aggregated_scores[idx] > 0:
-                    movie = self._preprocessor.get_movie_by_index(int(idx))
-                    if movie:
-                        score = float(aggregated_scores[idx])
-                        result.append((movie, score))
-                        if len(result) >= top_n:
-                            break
-            
-            # If we don't have enough recommendations, fill with popular movies
-            if len(result) < top_n:
-                recommended_ids = {m.id for m, _ in result}
-                popular_movies = [m for m in sorted(self.movies, 
-                        key=lambda x: (x.vote_count or 0, x.vote_average or 0), 
-                        reverse=True) if m.id not in recommended_ids and m.id not in user_movie_ids]
-                
-                for movie in popular_movies:
-                    if len(result) >= top_n:
-                        break
-                    result.append((movie, float(movie.popularity or 0)))
-            
-            return result
+            if user_watchlist is None:
+                user_watchlist = db.session.query(Watchlist.movie_id, Watchlist.watched).filter(
+                    Watchlist.user_id == user_id
+                ).all()
+            return self.get_recommendations_for_watchlist(user_watchlist, top_n=top_n,
+                                                          genre=genre, language=language)
         except Exception as e:
             print(f"Error getting user recommendations: {e}")
             import traceback
             traceback.print_exc()
-            return []
\ No newline at end of file
+            return []
+    
+    def get_recommendations_for_watchlist(self, user_watchlist, top_n=10, genre=None, language=None):
+        """Recommendations for already-loaded watchlist entries.
+        
+        Args:
+            user_watchlist: (movie_id, watched) pairs
+            
+        Returns:
+            List of tuples (movie, recommendation_score)
+        """
+        # Use watched movies if available, otherwise use added movies
+        watched_ids = [movie_id for movie_id, watched in user_watchlist if watched]
+        user_movie_ids = watched_ids or [movie_id for movie_id, _ in user_watchlist]
+        
+        if not user_movie_ids:
+            # Return popular movies if user has no watchlist
+            return self.get_popular_movies(top_n, genre=genre, language=language)
+        
+        return self.get_recommendations_for_movies(user_movie_ids, top_n=top_n)
+    
+    def get_recommendations_for_movies(self, movie_ids, top_n=10):
+        """Recommend movies similar to a set of seed movies (e.g. a watchlist).
+        
+        Seeds are excluded from the result; if too few similar movies are
+        found the list is filled with popular ones.
+        
+        Args:
+            movie_ids: IDs of the seed movies
+            top_n: Number of recommendations to return
+            
+        Returns:
+            List of tuples (movie, recommendation_score)
+        """
+        if not self.is_fitted:
+            return []
+        
+        top_indices, top_scores = self._score_seeds(movie_ids, top_n)
+        result = self._hydrate(top_indices, top_scores)
+        
+        # If we don't have enough recommendations, fill with popular movies
+        if len(result) < top_n:
+            exclude_ids = {m.id for m, _ in result} | set(movie_ids)
+            popular_movies = self._popular_movies(exclude_ids, top_n - len(result))
+            result.extend((movie, float(movie.popularity or 0)) for movie in popular_movies)
+        
+        return result
+    
+    def _score_seeds(self, movie_ids, top_n, neighbors_per_seed=50):
+        """Sum the neighbor scores of all seed movies in one batched pass.
+        
+        Returns:
+            Tuple (indices, scores) of the best top_n unseen movies with a
+            positive aggregated score, best first
+        """
+        n_movies = len(self._preprocessor.movie_ids)
+        seed_indices = [self._preprocessor.get_movie_index(movie_id) for movie_id in movie_ids]
+        seed_indices = np.unique(np.array([idx for idx in seed_indices if idx is not None], dtype=np.int64))
+        if len(seed_indices) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        
+        with SIMILARITY_DURATION.time('seeds'):
+            neighbor_indices, neighbor_scores = self._similarity.neighbors_batch(seed_indices, neighbors_per_seed)
+        valid = neighbor_indices >= 0
+        aggregated_scores = np.bincount(neighbor_indices[valid],
+                                        weights=neighbor_scores[valid],
+                                        minlength=n_movies)
+        
+        # Seen movies are masked out rather than checked one by one
+        aggregated_scores[seed_indices] = 0
+        
+        top_indices, top_scores = select_top_k(aggregated_scores[np.newaxis, :], top_n)
+        positive = top_scores[0] > 0
+        return top_indices[0][positive], top_scores[0][positive]
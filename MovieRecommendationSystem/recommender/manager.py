@@ -0,0 +1,229 @@
+import hashlib
+import threading
+import time
+
+from sqlalchemy import func
+
+from database.db import db
+from database.models import Movie
+from database.revision import catalog_revision, revision_tracking
+from metrics import FIT_DURATION
+from recommender.artifact import current_artifact_path, read_manifest
+from recommender.engine import ARTIFACT_MODES, RecommendationEngine
+from recommender.metadata import load_catalog_rows, load_changed_rows, load_metadata_rows, stream_catalog_features
+
+
+def catalog_fingerprint():
+    """Return a short fingerprint identifying the current movie catalog.
+
+    Combines max(id), the row count, sums over the numeric columns and the
+    catalog revision, which every change to a movie row advances (see
+    database/revision.py), so edits that keep lengths and sums unchanged,
+    such as a retitled movie, still change it. Two cheap queries, fine to
+    poll from requests.
+    """
+    row = db.session.query(
+        func.max(Movie.id),
+        func.count(Movie.id),
+        func.sum(Movie.vote_count),
+        func.sum(Movie.vote_average),
+        func.sum(Movie.popularity),
+    ).one()
+    raw = '|'.join(str(value) for value in tuple(row) + catalog_revision())
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class EngineManager:
+    """Process-wide holder for the RecommendationEngine.
+
+    The engine is built once at startup and shared by every request. The
+    catalog fingerprint is re-checked at most every `check_interval` seconds;
+    when it changes, a replacement engine is built on a background thread
+    and swapped in with a single reference assignment, so in-flight requests
+    keep using the engine they already hold.
+
+    Small changes are patched into a copy of the current engine; a full refit
+    runs when the last one is older than `full_refit_interval` seconds, so
+    vocabulary drift and approximate neighbor lists are corrected regularly.
+    """
+
+    def __init__(self, check_interval=60, full_refit_interval=86400):
+        self.check_interval = check_interval
+        self.full_refit_interval = full_refit_interval
+        self._last_full_refit = None
+        self._app = None
+        self._engine = None
+        self._version = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._refit_thread = None
+
+    def init_app(self, app):
+        """Bind to the Flask app and build the initial engine."""
+        self._app = app
+        self.check_interval = app.config.get('RECOMMENDER_CHECK_INTERVAL', self.check_interval)
+        self.full_refit_interval = app.config.get('RECOMMENDER_FULL_REFIT_INTERVAL', self.full_refit_interval)
+        app.extensions['engine_manager'] = self
+        with app.app_context():
+            try:
+                self.refit()
+            except Exception as e:
+                print(f"Error building recommendation engine: {e}")
+        self._last_check = time.monotonic()
+
+    @property
+    def engine(self):
+        """The current engine, without triggering a catalog check."""
+        return self._engine
+
+    @property
+    def version(self):
+        """Catalog fingerprint the current engine was built from."""
+        return self._version
+
+    def get(self):
+        """Return the current engine, scheduling a refit if the catalog changed."""
+        self._maybe_schedule_refit()
+        return self._engine
+
+    def refit(self, full=False):
+        """Build an engine for the current catalog and swap it in.
+
+        A prebuilt artifact for the same catalog version is memory-mapped
+        instead of fitting. Otherwise the current engine is patched with the
+        changed movies when possible, falling back to a full fit. Where the
+        database stamps rows with their revision (SQLite), only the rows
+        changed since the engine's revision are loaded for the patch. Must
+        run inside an application context. Returns the active engine.
+
+        Args:
+            full: Skip the incremental path and always fit from scratch
+        """
+        # Read first: rows changed while fitting carry a later revision and are patched next time
+        revision = catalog_revision()[0]
+        version = catalog_fingerprint()
+        artifact_path = self._artifact_for(version)
+        if artifact_path is not None:
+            with FIT_DURATION.time('artifact'):
+                self._engine = RecommendationEngine.from_artifact(artifact_path, mode=self._engine_options()['mode'])
+            self._engine.catalog_revision = revision
+            self._version = version
+            self._last_full_refit = time.monotonic()
+            return self._engine
+
+        if db.session.query(Movie.id).first() is None:
+            self._engine, self._version = None, version
+            return None
+
+        chunk_size = self._app.config.get('RECOMMENDER_FIT_CHUNK_SIZE') if self._app is not None else None
+        if chunk_size:
+            # Streamed fit: the catalog's text is never loaded at once, so there
+            # is no full movie list to diff against and every change refits
+            with FIT_DURATION.time('stream'):
+                engine = RecommendationEngine.fit_stream(
+                    lambda: stream_catalog_features(chunk_size),
+                    load_metadata_rows,
+                    version=version,
+                    **self._engine_options()
+                )
+        else:
+            if not full and not self._full_refit_due() and self._engine is not None:
+                with FIT_DURATION.time('incremental'):
+                    engine = self._patch(version)
+                if engine is not None:
+                    engine.catalog_revision = revision
+                    self._engine, self._version = engine, version
+                    return self._engine
+            with FIT_DURATION.time('full'):
+                engine = RecommendationEngine(movies=load_catalog_rows(), version=version, **self._engine_options())
+        if engine.is_fitted:
+            engine.catalog_revision = revision
+            # Single reference assignment: readers see either the old or the new engine
+            self._engine = engine
+            self._version = version
+            self._last_full_refit = time.monotonic()
+        else:
+            # The version stays behind, so the next catalog check retries the fit
+            print(f"Keeping previous recommendation engine, refit for catalog {version} failed")
+        return self._engine
+
+    def _patch(self, version):
+        """The current engine patched to `version`, or None when a full fit is needed."""
+        since = self._engine.catalog_revision
+        if since is None or not revision_tracking():
+            return self._engine.with_updates(load_catalog_rows(), version=version)
+        # Count and id sum let the engine spot deletions without loading every row
+        catalog = tuple(int(value or 0) for value in
+                        db.session.query(func.count(Movie.id), func.sum(Movie.id)).one())
+        return self._engine.with_updates(load_changed_rows(since), version=version, catalog=catalog)
+
+    def _full_refit_due(self):
+        if self._last_full_refit is None:
+            return True
+        return time.monotonic() - self._last_full_refit >= self.full_refit_interval
+
+    def _artifact_for(self, version):
+        artifact_dir = self._app.config.get('RECOMMENDER_ARTIFACT_DIR') if self._app is not None else None
+        if not artifact_dir or self._engine_options()['mode'] not in ARTIFACT_MODES:
+            return None
+        path = current_artifact_path(artifact_dir)
+        if path is None:
+            return None
+        manifest = read_manifest(path)
+        if manifest['catalog_version'] != version:
+            return None
+        # An artifact built with an LSA embedding only serves engines configured for one
+        if bool(manifest.get('embedding_dim')) != bool(self._engine_options()['embedding_dim']):
+            return None
+        return path
+
+    def _engine_options(self):
+        config = self._app.config if self._app is not None else {}
+        return {
+            'mode': config.get('RECOMMENDER_MODE', 'neighbors'),
+            'top_k': config.get('RECOMMENDER_TOP_K', 50),
+            'ann_lists': config.get('RECOMMENDER_ANN_LISTS') or None,
+            'ann_probe': config.get('RECOMMENDER_ANN_PROBE', 8),
+            'embedding_dim': config.get('RECOMMENDER_EMBEDDING_DIM') or None,
+            'build_workers': config.get('RECOMMENDER_BUILD_WORKERS', 1),
+        }
+
+    def _maybe_schedule_refit(self):
+        now = time.monotonic()
+        if self._app is None or now - self._last_check < self.check_interval:
+            return
+
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            if self._refit_thread is not None and self._refit_thread.is_alive():
+                return
+
+            try:
+                version = catalog_fingerprint()
+            except Exception as e:
+                print(f"Error checking catalog fingerprint: {e}")
+                return
+            if version == self._version:
+                return
+
+            self._refit_thread = threading.Thread(
+                target=self._background_refit,
+                name='recommender-refit',
+                daemon=True,
+            )
+            self._refit_thread.start()
+
+    def _background_refit(self):
+        with self._app.app_context():
+            try:
+                started = time.perf_counter()
+                self.refit()
+                print(f"Recommendation engine refit for catalog {self._version} "
+                      f"in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                print(f"Error refitting recommendation engine: {e}")
+
+
+engine_manager = EngineManager()
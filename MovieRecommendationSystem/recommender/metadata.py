@@ -0,0 +1,279 @@
+from itertools import islice
+
+import numpy as np
+
+from database.db import db
+from database.genres import split_genres
+from database.models import Movie
+from database.revision import changed_since
+
+# Columns the recommender needs: ranking fields, display fields and the text it fits on.
+# overview is left out; it is only shown on the detail page, which loads the full Movie.
+CATALOG_COLUMNS = ('id', 'tmdb_id', 'title', 'genres', 'release_date', 'vote_average', 'vote_count',
+                   'popularity', 'poster_path', 'backdrop_path', 'original_language', 'combined_features')
+
+
+def load_catalog_rows(columns=CATALOG_COLUMNS):
+    """Fetch the catalog as plain column rows instead of ORM objects.
+
+    Rows expose the same attribute names as Movie, so they can be passed
+    anywhere the recommender accepts movies, without identity-map overhead.
+    """
+    return db.session.query(*[getattr(Movie, column) for column in columns]).all()
+
+
+def load_metadata_rows():
+    """Catalog rows with the metadata columns only, no text to fit on."""
+    return load_catalog_rows([column for column in CATALOG_COLUMNS if column != 'combined_features'])
+
+
+def load_changed_rows(since, columns=CATALOG_COLUMNS):
+    """Catalog rows inserted or updated after catalog revision `since`, via the movies.revision index."""
+    return db.session.query(*[getattr(Movie, column) for column in columns]).filter(changed_since(since)).all()
+
+
+def stream_catalog_features(chunk_size=10000):
+    """Yield lists of (id, combined_features) rows in id order, chunk_size at a time.
+
+    Uses a server-side cursor where the driver supports one (yield_per
+    implies stream_results), so at most one chunk of text is in memory.
+    """
+    rows = iter(db.session.query(Movie.id, Movie.combined_features).order_by(Movie.id).yield_per(chunk_size))
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class MovieRecord:
+    """Lightweight, session-independent stand-in for a Movie in result lists.
+
+    Carries the fields the listing templates render, so recommendation pages
+    never touch lazy-loaded ORM state.
+    """
+
+    __slots__ = ('id', 'tmdb_id', 'title', 'genres', 'release_date', 'poster_path', 'backdrop_path',
+                 'original_language', 'vote_average', 'vote_count', 'popularity')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_movie(cls, movie):
+        """Copy the record fields of a Movie object or catalog row."""
+        return cls(**{name: getattr(movie, name, None) for name in cls.__slots__})
+
+    def __repr__(self):
+        return f'<MovieRecord {self.title}>'
+
+
+def _code(language, codes, names):
+    """Integer code of `language` (0 is "none"), registering new languages in codes and names."""
+    if not language:
+        return 0
+    if language not in codes:
+        codes[language] = len(names)
+        names.append(language)
+    return codes[language]
+
+
+def _language_codes(records):
+    """(names, per-row code) for the records' original_language; names[0] stands for none."""
+    names, codes = [None], {}
+    return names, np.array([_code(record.original_language, codes, names) for record in records],
+                           dtype=np.int32)
+
+
+def _genre_matrix(records):
+    """(names, (rows, genres) bool membership) parsed from the records' genre strings."""
+    names, column, parsed = [], {}, {}
+    rows, columns = [], []
+    for row, record in enumerate(records):
+        genres = record.genres or ''
+        if genres not in parsed:
+            # Catalogs repeat a few hundred genre strings, so each is split once
+            parsed[genres] = [column.setdefault(name, len(column)) for name in split_genres(genres)]
+        for col in parsed[genres]:
+            rows.append(row)
+            columns.append(col)
+    names = sorted(column, key=column.get)
+    matrix = np.zeros((len(records), len(names)), dtype=bool)
+    matrix[np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)] = True
+    return names, matrix
+
+
+class MovieMetadataStore:
+    """Columnar metadata for every movie, aligned with the model's matrix rows.
+
+    Ranking fields are NumPy arrays, so popularity ordering and filtering are
+    vectorized; display fields live in one __slots__ record per movie. Long
+    text columns (overview, combined_features) are not kept. Genre membership
+    is a (rows, genres) bool matrix and languages are integer codes, so the
+    per-group orders are re-ranked with array operations, and with_updates()
+    only parses the rows that changed.
+    """
+
+    def __init__(self, ids, tmdb_ids, popularity, vote_count, vote_average, records,
+                 genres=None, languages=None):
+        self.ids = ids
+        self.tmdb_ids = tmdb_ids
+        self.popularity = popularity
+        self.vote_count = vote_count
+        self.vote_average = vote_average
+        self.records = records
+        # (names, per-row membership); parsed from the records unless a patched copy is passed in
+        self.genre_names, self.genre_matrix = genres if genres is not None else _genre_matrix(records)
+        self.language_names, self.language_codes = (
+            languages if languages is not None else _language_codes(records))
+
+        # Ranked once per store (i.e. per engine version), so fallbacks never sort
+        self.popular_order = np.lexsort(
+            (np.arange(len(ids)), -vote_average, -vote_count)).astype(np.int32)
+        self.genre_orders = {}
+        for column, name in enumerate(self.genre_names):
+            order = self.popular_order[self.genre_matrix[self.popular_order, column]]
+            if len(order):
+                self.genre_orders[name] = order
+        # Stable sort by language code keeps popularity order within each language
+        by_language = self.popular_order[np.argsort(self.language_codes[self.popular_order], kind='stable')]
+        codes = self.language_codes[by_language]
+        bounds = np.searchsorted(codes, np.arange(len(self.language_names) + 1))
+        self.language_orders = {
+            name: by_language[bounds[code]:bounds[code + 1]]
+            for code, name in enumerate(self.language_names) if code and bounds[code + 1] > bounds[code]
+        }
+
+    @classmethod
+    def from_movies(cls, movies):
+        """Build a store from Movie objects or catalog rows, in the given order."""
+        records = [MovieRecord.from_movie(movie) for movie in movies]
+        return cls(
+            ids=np.array([r.id for r in records], dtype=np.int64),
+            tmdb_ids=np.array([r.tmdb_id or 0 for r in records], dtype=np.int64),
+            popularity=np.array([r.popularity or 0 for r in records], dtype=np.float64),
+            vote_count=np.array([r.vote_count or 0 for r in records], dtype=np.int64),
+            vote_average=np.array([r.vote_average or 0 for r in records], dtype=np.float64),
+            records=records,
+        )
+
+    @classmethod
+    def aligned(cls, movies, movie_ids):
+        """Build a store whose rows follow movie_ids (e.g. the model's matrix rows).
+
+        IDs missing from `movies` (deleted in the meantime) get an empty
+        record, so row positions still line up.
+        """
+        by_id = {movie.id: movie for movie in movies}
+        return cls.from_movies([by_id.get(int(movie_id)) or MovieRecord(id=int(movie_id))
+                                for movie_id in movie_ids])
+
+    def with_updates(self, movies, positions):
+        """Return a copy with `movies` written at rows `positions`, appending rows past the end.
+
+        Only the given movies are converted and parsed; the arrays are copied
+        and the orders re-ranked with vectorized operations. This store is
+        left untouched.
+
+        Args:
+            movies: Changed or added movies (Movie objects or catalog rows)
+            positions: Matrix row of each movie, e.g. from get_movie_indices()
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        n_rows = max(len(self.records), int(positions.max()) + 1 if len(positions) else 0)
+        grow = n_rows - len(self.records)
+
+        def extended(values):
+            return np.concatenate([values, np.zeros(grow, dtype=values.dtype)])
+
+        ids, tmdb_ids = extended(self.ids), extended(self.tmdb_ids)
+        popularity, vote_count, vote_average = (
+            extended(self.popularity), extended(self.vote_count), extended(self.vote_average))
+        records = self.records + [None] * grow
+        genre_names = list(self.genre_names)
+        genre_column = {name: column for column, name in enumerate(genre_names)}
+        genre_matrix = np.vstack([self.genre_matrix, np.zeros((grow, len(genre_names)), dtype=bool)])
+        language_names = list(self.language_names)
+        language_code = {name: code for code, name in enumerate(language_names)}
+        language_codes = extended(self.language_codes)
+
+        for movie, row in zip(movies, positions):
+            record = records[row] = MovieRecord.from_movie(movie)
+            ids[row], tmdb_ids[row] = record.id, record.tmdb_id or 0
+            popularity[row], vote_count[row] = record.popularity or 0, record.vote_count or 0
+            vote_average[row] = record.vote_average or 0
+            genre_matrix[row] = False
+            for name in split_genres(record.genres):
+                if name not in genre_column:
+                    genre_column[name] = len(genre_names)
+                    genre_names.append(name)
+                    genre_matrix = np.hstack([genre_matrix, np.zeros((n_rows, 1), dtype=bool)])
+                genre_matrix[row, genre_column[name]] = True
+            language_codes[row] = _code(record.original_language, language_code, language_names)
+
+        return MovieMetadataStore(ids, tmdb_ids, popularity, vote_count, vote_average, records,
+                                  genres=(genre_names, genre_matrix),
+                                  languages=(language_names, language_codes))
+
+    def __len__(self):
+        return len(self.records)
+
+    def record(self, index):
+        return self.records[index]
+
+    def _genre_language_order(self, genre, language, needed):
+        """Rows in both `genre` and `language`, best first, at least `needed` of them if they exist.
+
+        Walks the shorter of the two precomputed orders in growing chunks and
+        checks membership in the other group through the per-row genre
+        matrix or language codes, so the cost follows the answer size rather
+        than the catalog size.
+        """
+        genre_order = self.genre_orders.get(genre)
+        language_order = self.language_orders.get(language)
+        if genre_order is None or language_order is None:
+            return np.empty(0, dtype=np.int32)
+        if len(genre_order) <= len(language_order):
+            order, code = genre_order, self.language_names.index(language)
+            members = lambda rows: self.language_codes[rows] == code
+        else:
+            order, column = language_order, self.genre_names.index(genre)
+            members = lambda rows: self.genre_matrix[rows, column]
+
+        found, n_found, start, step = [], 0, 0, max(needed, 64)
+        while start < len(order) and n_found < needed:
+            rows = order[start:start + step]
+            rows = rows[members(rows)]
+            found.append(rows)
+            n_found += len(rows)
+            start += step
+            step *= 2
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int32)
+
+    def popular_records(self, exclude_ids, limit, genre=None, language=None):
+        """Most-voted records whose ID is not in exclude_ids, best first.
+
+        Only the first limit + len(exclude_ids) ranked rows can contain the
+        answer, so the cost is independent of catalog size.
+
+        Args:
+            exclude_ids: IDs to skip, e.g. the user's watchlist
+            limit: Number of records to return
+            genre: Restrict to one genre
+            language: Restrict to one original_language code
+        """
+        if genre and language:
+            order = self._genre_language_order(genre, language, limit + len(exclude_ids))
+        elif genre:
+            order = self.genre_orders.get(genre, np.empty(0, dtype=np.int32))
+        elif language:
+            order = self.language_orders.get(language, np.empty(0, dtype=np.int32))
+        else:
+            order = self.popular_order
+
+        window = order[:limit + len(exclude_ids)]
+        if exclude_ids:
+            excluded = np.fromiter(exclude_ids, dtype=np.int64, count=len(exclude_ids))
+            window = window[~np.isin(self.ids[window], excluded)]
+        return [self.records[idx] for idx in window[:limit]]
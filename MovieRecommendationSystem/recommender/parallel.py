@@ -0,0 +1,140 @@
+"""Process-pool versions of the heavy model-build stages.
+
+Every function here produces output identical to the serial code path:
+documents and rows are split into contiguous ranges, each range is
+processed exactly as the serial code would process it, and results are
+reassembled in order.
+"""
+import collections
+import multiprocessing
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+from recommender.similarity import neighbor_rows
+
+# Set in pool workers by _init_neighbor_worker (inherited directly under fork)
+_matrix = None
+_matrix_t = None
+
+
+def process_pool(workers, initializer=None, initargs=()):
+    """Pool that forks where possible, so workers share the parent's arrays copy-on-write."""
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method).Pool(workers, initializer=initializer, initargs=initargs)
+
+
+def split_ranges(n_items, n_parts, align=1):
+    """Split range(n_items) into up to n_parts contiguous (start, stop) ranges.
+
+    Range boundaries fall on multiples of `align`, so block-wise work sees
+    the same blocks as the serial loop.
+    """
+    n_blocks = -(-n_items // align)
+    per_part = max(1, -(-n_blocks // max(1, n_parts)))
+    return [(start * align, min((start + per_part) * align, n_items))
+            for start in range(0, n_blocks, per_part)]
+
+
+def map_chunks(func, tasks, workers, initializer=None, initargs=(), window=None):
+    """Ordered map of func over an iterator of tasks, on a pool when workers > 1.
+
+    Tasks are pulled on the calling thread with at most `window` in flight,
+    so producers such as streaming database cursors stay on one thread and
+    only a bounded number of chunks is held in memory. With one worker the
+    initializer runs in-process and tasks are mapped serially.
+    """
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(func, tasks)
+        return
+    window = window or 2 * workers
+    with process_pool(workers, initializer=initializer, initargs=initargs) as pool:
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(pool.apply_async(func, (task,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def term_counts(args):
+    """(terms, int64 totals) of one chunk of documents, terms sorted."""
+    params, documents = args
+    counter = CountVectorizer(**params)
+    try:
+        counts = counter.fit_transform(documents)
+    except ValueError:
+        # Chunk made only of stop words
+        return np.empty(0, dtype=str), np.empty(0, dtype=np.int64)
+    return counter.get_feature_names_out(), np.asarray(counts.sum(axis=0)).ravel()
+
+
+def count_rows(args):
+    """Term-count matrix of one chunk of documents for a fixed vocabulary."""
+    params, vocabulary, documents = args
+    return CountVectorizer(vocabulary=vocabulary, **params).transform(documents)
+
+
+def fit_vocabulary(params, documents, max_features, workers):
+    """Build the CountVectorizer vocabulary of `documents` on a process pool.
+
+    Term totals are counted per chunk and summed; the max_features cut then
+    repeats CountVectorizer's own selection (same int64 totals, same order,
+    same argsort), so ties are broken exactly as in a serial fit.
+
+    Returns:
+        Dict term -> column index, in alphabetical order
+    """
+    chunks = [documents[start:stop] for start, stop in split_ranges(len(documents), workers * 4)]
+    with process_pool(workers) as pool:
+        results = pool.map(term_counts, [(params, chunk) for chunk in chunks])
+
+    terms, inverse = np.unique(np.concatenate([chunk_terms for chunk_terms, _ in results]),
+                               return_inverse=True)
+    tfs = np.bincount(inverse, weights=np.concatenate([counts for _, counts in results]),
+                      minlength=len(terms)).astype(np.int64)
+    return select_vocabulary(terms, tfs, max_features)
+
+
+def select_vocabulary(terms, tfs, max_features):
+    """CountVectorizer's max_features cut over alphabetically sorted terms and their int64 totals.
+
+    Returns:
+        Dict term -> column index, in alphabetical order
+    """
+    if len(terms) == 0:
+        raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+    if max_features is not None and len(terms) > max_features:
+        terms = terms[np.sort((-tfs).argsort()[:max_features])]
+    return {str(term): idx for idx, term in enumerate(terms)}
+
+
+def count_matrix(params, vocabulary, documents, workers):
+    """Term-count matrix of `documents` for a fixed vocabulary, rows in input order."""
+    chunks = [documents[start:stop] for start, stop in split_ranges(len(documents), workers * 4)]
+    with process_pool(workers) as pool:
+        parts = pool.map(count_rows, [(params, vocabulary, chunk) for chunk in chunks])
+    return sparse.vstack(parts, format='csr')
+
+
+def _init_neighbor_worker(matrix, matrix_t):
+    global _matrix, _matrix_t
+    _matrix, _matrix_t = matrix, matrix_t
+
+
+def _neighbor_range(args):
+    start, stop, k, block_size = args
+    return neighbor_rows(_matrix, _matrix_t, start, stop, k, block_size)
+
+
+def neighbor_table(matrix, matrix_t, k, block_size, workers):
+    """Top-k neighbor table computed over row ranges on a process pool."""
+    ranges = split_ranges(matrix.shape[0], workers * 4, align=block_size)
+    with process_pool(workers, initializer=_init_neighbor_worker, initargs=(matrix, matrix_t)) as pool:
+        parts = pool.map(_neighbor_range, [(start, stop, k, block_size) for start, stop in ranges])
+    return (np.concatenate([indices for indices, _ in parts]),
+            np.concatenate([scores for _, scores in parts]))
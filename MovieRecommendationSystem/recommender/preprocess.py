@@ -1,54 +1,379 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+import copy
+import zlib
 import numpy as np
+from recommender import parallel
+from recommender.similarity import neighbor_rows, to_dense, top_k as select_top_k
+
+# Distinct terms fit_stream() keeps in memory while choosing the vocabulary, per max_features
+STREAM_MAX_TERMS_FACTOR = 100
+
+def content_digests(movies):
+    """CRC32 of each movie's combined_features, used to detect changed rows"""
+    return np.array([zlib.crc32((movie.combined_features or '').encode('utf-8')) for movie in movies],
+                    dtype=np.uint32)
+
+def _most_frequent(totals, keep):
+    """The `keep` entries of a term -> count dict with the highest counts"""
+    terms = list(totals)
+    counts = np.fromiter(totals.values(), dtype=np.int64, count=len(terms))
+    return {terms[idx]: int(counts[idx]) for idx in np.argpartition(-counts, keep)[:keep]}
 
 class MoviePreprocessor:
-    def __init__(self):
+    def __init__(self, vocabulary=None):
         self.vectorizer = TfidfVectorizer(
             max_features=5000,
             stop_words='english',
-            ngram_range=(1, 2)
+            ngram_range=(1, 2),
+            vocabulary=vocabulary
         )
         self.tfidf_matrix = None
-        self.movie_indices = {}
-        self.movies = []
+        self.svd_components = None
+        self.embedding = None
+        self.movie_ids = np.empty(0, dtype=np.int64)
+        self._id_order = np.empty(0, dtype=np.int64)
+        self.content_digests = None
     
-    def fit(self, movies):
-        """Fit the TF-IDF vectorizer on movie features"""
-        self.movies = movies
+    @classmethod
+    def from_arrays(cls, vocabulary, idf, tfidf_matrix, movie_ids, id_order=None,
+                    svd_components=None, embedding=None, content_digests=None):
+        """Rebuild a fitted preprocessor from saved arrays without refitting.
         
+        Args:
+            vocabulary: Terms ordered by TF-IDF column index
+            idf: Inverse document frequency per column
+            tfidf_matrix: L2-normalized CSR matrix, one row per movie
+            movie_ids: Database ID of each matrix row
+            id_order: Optional precomputed argsort of movie_ids
+            svd_components: Optional LSA projection, shape (dim, features)
+            embedding: Optional L2-normalized LSA vectors, one row per movie
+            content_digests: Optional feature digest per row, for incremental updates
+        """
+        preprocessor = cls()
+        preprocessor._set_fitted({str(term): idx for idx, term in enumerate(vocabulary)}, np.asarray(idf))
+        preprocessor.tfidf_matrix = tfidf_matrix
+        preprocessor.svd_components = svd_components
+        preprocessor.embedding = embedding
+        preprocessor.content_digests = content_digests
+        preprocessor._set_movie_ids(movie_ids, id_order)
+        return preprocessor
+    
+    def _set_movie_ids(self, movie_ids, id_order=None):
+        """Store the row → ID mapping and a sorted view for ID → row lookups"""
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if id_order is None:
+            id_order = np.argsort(self.movie_ids, kind='stable')
+        self._id_order = id_order
+    
+    def fit(self, movies, workers=1):
+        """Fit the TF-IDF vectorizer on movie features.
+        
+        Only `id` and `combined_features` are read, and the movies are not
+        kept, so ORM objects or plain column rows both work.
+        
+        Args:
+            movies: Movie objects or catalog rows
+            workers: Processes for tokenization and counting; the result is
+                identical to the single-process fit
+        """
         # Create combined features list
         features = [movie.combined_features or '' for movie in movies]
         
         # Build TF-IDF matrix
-        self.tfidf_matrix = self.vectorizer.fit_transform(features)
+        self.tfidf_matrix = self._fit_transform(features, workers)
         
         # Create movie ID to index mapping
-        self.movie_indices = {movie.id: idx for idx, movie in enumerate(movies)}
+        self._set_movie_ids([movie.id for movie in movies])
+        self.content_digests = content_digests(movies)
         
         print(f"Preprocessor fitted on {len(movies)} movies")
         print(f"TF-IDF matrix shape: {self.tfidf_matrix.shape}")
         
         return self
     
+    def fit_stream(self, read_chunks, workers=1, max_terms=None):
+        """Fit from a catalog streamed in chunks, without holding its text in memory.
+        
+        Two passes over the data: the first sums term counts per chunk to pick
+        the vocabulary, the second counts each chunk against it. Only the
+        sparse count matrix is kept.
+        
+        The first pass holds a total for every distinct n-gram seen so far,
+        bounded by max_terms: when there are more, only the most frequent
+        half is kept and later counts of dropped terms start from zero. Up to
+        that bound the result is identical to fit() on the same rows in the
+        same order; past it, the vocabulary can differ in its rarest terms.
+        
+        Args:
+            read_chunks: Callable returning a fresh iterator over lists of rows
+                with `id` and `combined_features`; it is called twice
+            workers: Processes counting chunks in parallel
+            max_terms: Most distinct terms held during the first pass;
+                defaults to STREAM_MAX_TERMS_FACTOR * max_features
+        """
+        params, count_params = self._count_params()
+        
+        vocabulary = params['vocabulary']
+        if vocabulary is None:
+            if max_terms is None:
+                max_terms = STREAM_MAX_TERMS_FACTOR * (params['max_features'] or 5000)
+            totals = {}
+            pruned = 0
+            tasks = ((count_params, [row.combined_features or '' for row in rows]) for rows in read_chunks())
+            for terms, counts in parallel.map_chunks(parallel.term_counts, tasks, workers):
+                for term, count in zip(terms, counts.tolist()):
+                    totals[term] = totals.get(term, 0) + count
+                if len(totals) > max_terms:
+                    pruned += 1
+                    totals = _most_frequent(totals, max_terms // 2)
+            if pruned:
+                print(f"Streamed vocabulary pruned {pruned} times to {max_terms // 2} terms; "
+                      f"rare terms are approximate")
+            terms = np.array(sorted(totals), dtype=object)
+            tfs = np.array([totals[term] for term in terms], dtype=np.int64)
+            del totals
+            vocabulary = parallel.select_vocabulary(terms, tfs, params['max_features'])
+        
+        movie_ids, digests = [], []
+        
+        def count_tasks():
+            for rows in read_chunks():
+                movie_ids.extend(row.id for row in rows)
+                digests.append(content_digests(rows))
+                yield count_params, vocabulary, [row.combined_features or '' for row in rows]
+        
+        parts = list(parallel.map_chunks(parallel.count_rows, count_tasks(), workers))
+        if not parts:
+            raise ValueError("No movies to fit on")
+        counts = sparse.vstack(parts, format='csr')
+        
+        self.tfidf_matrix = self._weight_counts(counts, vocabulary, params)
+        self._set_movie_ids(movie_ids)
+        self.content_digests = np.concatenate(digests)
+        
+        print(f"Preprocessor fitted on {len(movie_ids)} streamed movies")
+        print(f"TF-IDF matrix shape: {self.tfidf_matrix.shape}")
+        
+        return self
+    
+    def _count_params(self):
+        """Vectorizer params, and the subset that configures term counting"""
+        params = self.vectorizer.get_params()
+        count_params = {key: params[key] for key in (
+            'input', 'encoding', 'decode_error', 'strip_accents', 'lowercase', 'preprocessor',
+            'tokenizer', 'stop_words', 'token_pattern', 'ngram_range', 'analyzer', 'binary'
+        )}
+        count_params['dtype'] = np.int64
+        return params, count_params
+    
+    def _fit_transform(self, features, workers=1):
+        """Equivalent of vectorizer.fit_transform, optionally on a process pool.
+        
+        Every fit path builds the same count matrix with sorted column indices
+        before weighting, so serial, parallel and streamed results are
+        bit-identical.
+        """
+        params, count_params = self._count_params()
+        
+        if workers > 1:
+            vocabulary = params['vocabulary'] or parallel.fit_vocabulary(
+                count_params, features, params['max_features'], workers)
+            counts = parallel.count_matrix(count_params, vocabulary, features, workers)
+        else:
+            counter = CountVectorizer(max_features=params['max_features'], vocabulary=params['vocabulary'],
+                                      **count_params)
+            counts = counter.fit_transform(features)
+            vocabulary = counter.vocabulary_
+        return self._weight_counts(counts, vocabulary, params)
+    
+    def _weight_counts(self, counts, vocabulary, params):
+        """Apply TfidfVectorizer's weighting to a count matrix and fix the vectorizer's state"""
+        counts.sort_indices()
+        transformer = TfidfTransformer(norm=params['norm'], use_idf=params['use_idf'],
+                                       smooth_idf=params['smooth_idf'], sublinear_tf=params['sublinear_tf'])
+        tfidf_matrix = transformer.fit_transform(counts)
+        
+        self._set_fitted(vocabulary, transformer.idf_)
+        return tfidf_matrix.astype(params['dtype'], copy=False)
+    
+    def _set_fitted(self, vocabulary, idf):
+        """Leave the vectorizer usable for transform() with a fitted vocabulary and weights.
+        
+        Stored in vocabulary_ and idf_ as fit() would; the vocabulary
+        constructor parameter stays as configured, so the next fit learns a
+        new vocabulary instead of reusing this one.
+        """
+        self.vectorizer.vocabulary_ = vocabulary
+        self.vectorizer.idf_ = idf
+    
+    def fit_embedding(self, n_components=128, random_state=0):
+        """Reduce TF-IDF rows to a dense LSA embedding with TruncatedSVD.
+        
+        Once fitted, `vectors` returns the embedding, so similarity and top-K
+        run as dense float32 matrix products (multi-threaded BLAS) instead of
+        sparse-times-sparse.
+        
+        Args:
+            n_components: Embedding dimension, typically 64-256
+            random_state: Seed for the randomized SVD
+            
+        Returns:
+            The (N, n_components) L2-normalized float32 embedding, or None
+            when the catalog is too small to reduce (one movie or one term)
+            and `vectors` stays the TF-IDF matrix
+        """
+        if self.tfidf_matrix is None:
+            raise ValueError("Must call fit() before fitting an embedding")
+        
+        n_components = min(n_components, self.tfidf_matrix.shape[1] - 1, self.tfidf_matrix.shape[0] - 1)
+        if n_components < 1:
+            print(f"Skipping LSA embedding for a {self.tfidf_matrix.shape[0]}x{self.tfidf_matrix.shape[1]} "
+                  f"TF-IDF matrix, using TF-IDF vectors")
+            return None
+        svd = TruncatedSVD(n_components=n_components, random_state=random_state)
+        svd.fit(self.tfidf_matrix)
+        self.svd_components = svd.components_.astype(np.float32)
+        self.embedding = self.project(self.tfidf_matrix)
+        
+        print(f"LSA embedding shape: {self.embedding.shape}")
+        return self.embedding
+    
+    def project(self, tfidf_rows):
+        """Map TF-IDF rows into the LSA space as L2-normalized float32 vectors"""
+        vectors = np.ascontiguousarray(tfidf_rows @ self.svd_components.T, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+    
+    @property
+    def vectors(self):
+        """Row vectors used for similarity: the LSA embedding if fitted, else TF-IDF"""
+        return self.embedding if self.embedding is not None else self.tfidf_matrix
+    
     def compute_similarity_matrix(self):
         """Compute cosine similarity matrix"""
         if self.tfidf_matrix is None:
             raise ValueError("Must call fit() before computing similarity")
         
-        similarity_matrix = cosine_similarity(self.tfidf_matrix, self.tfidf_matrix)
+        similarity_matrix = cosine_similarity(self.vectors, self.vectors)
         return similarity_matrix
     
+    def compute_neighbor_table(self, top_k=50, block_size=256, workers=1):
+        """Compute the top-K most similar movies for every movie.
+        
+        Similarities are computed one block of rows at a time with a matrix
+        product (sparse for TF-IDF, BLAS GEMM for an LSA embedding), so peak
+        memory is O(block_size·N) and the result is O(N·K) instead of the
+        dense N×N matrix.
+        
+        Args:
+            top_k: Number of neighbors kept per movie
+            block_size: Number of rows scored per sparse product
+            workers: Processes scoring row ranges in parallel; the result is
+                identical to the single-process build
+            
+        Returns:
+            Tuple (indices, scores) of int32/float32 arrays shaped (N, K),
+            best first, with each movie excluded from its own list
+        """
+        if self.tfidf_matrix is None:
+            raise ValueError("Must call fit() before computing similarity")
+        
+        # Rows are already L2-normalized, so X·Xᵀ is the cosine similarity
+        if sparse.issparse(self.vectors):
+            matrix = self.vectors.tocsr().astype(np.float32)
+            matrix_t = matrix.T.tocsc()
+        else:
+            matrix = self.vectors
+            matrix_t = matrix.T
+        n_movies = matrix.shape[0]
+        k = min(top_k, n_movies - 1)
+        
+        if workers > 1:
+            return parallel.neighbor_table(matrix, matrix_t, k, block_size, workers)
+        return neighbor_rows(matrix, matrix_t, 0, n_movies, k, block_size)
+    
+    def similarity_scores(self, movie_idx):
+        """Cosine similarity of one movie to every movie, via a matrix-vector product"""
+        if self.tfidf_matrix is None:
+            raise ValueError("Must call fit() before computing similarity")
+        
+        row = self.vectors[movie_idx:movie_idx + 1]
+        return to_dense(self.vectors @ row.T).astype(np.float32).ravel()
+    
     def get_movie_index(self, movie_id):
         """Get the index of a movie by its database ID"""
-        return self.movie_indices.get(movie_id)
-    
-    def get_movie_by_index(self, index):
-        """Get movie object by its index"""
-        if 0 <= index < len(self.movies):
-            return self.movies[index]
+        pos = np.searchsorted(self.movie_ids, movie_id, sorter=self._id_order)
+        if pos < len(self._id_order) and self.movie_ids[self._id_order[pos]] == movie_id:
+            return int(self._id_order[pos])
         return None
     
+    def get_movie_indices(self, movie_ids):
+        """Vectorized get_movie_index; unknown IDs map to -1"""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if len(self.movie_ids) == 0:
+            return np.full(len(movie_ids), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.movie_ids, movie_ids, sorter=self._id_order),
+                         len(self._id_order) - 1)
+        indices = np.asarray(self._id_order[pos], dtype=np.int64)
+        return np.where(self.movie_ids[indices] == movie_ids, indices, -1)
+    
+    def with_updates(self, movies):
+        """Return a copy with rows for added or updated movies, using the existing vocabulary.
+        
+        Updated movies keep their row; new movies are appended. The vocabulary
+        and IDF weights are not refitted, so terms unseen at fit time are
+        ignored until the next full fit.
+        
+        Args:
+            movies: Added or changed movie objects
+            
+        Returns:
+            Tuple (preprocessor, changed_indices) where changed_indices are
+            the matrix rows that were replaced or appended
+        """
+        if self.tfidf_matrix is None:
+            raise ValueError("Must call fit() before applying updates")
+        
+        rows = self.vectorizer.transform([movie.combined_features or '' for movie in movies])
+        rows = rows.astype(self.tfidf_matrix.dtype)
+        movie_ids = np.array([movie.id for movie in movies], dtype=np.int64)
+        positions = self.get_movie_indices(movie_ids)
+        updated = np.flatnonzero(positions >= 0)
+        added = np.flatnonzero(positions < 0)
+        n_movies = self.tfidf_matrix.shape[0]
+        
+        # Zero out updated rows, scatter their new values in, then append new movies
+        keep = np.ones(n_movies, dtype=self.tfidf_matrix.dtype)
+        keep[positions[updated]] = 0
+        scatter = sparse.csr_matrix(
+            (np.ones(len(updated), dtype=rows.dtype), (positions[updated], np.arange(len(updated)))),
+            shape=(n_movies, len(updated))
+        )
+        patched = sparse.diags(keep) @ self.tfidf_matrix + scatter @ rows[updated]
+        
+        preprocessor = copy.copy(self)
+        preprocessor.tfidf_matrix = sparse.vstack([patched, rows[added]], format='csr')
+        if self.embedding is not None:
+            projected = self.project(rows)
+            embedding = np.vstack([self.embedding, projected[added]])
+            embedding[positions[updated]] = projected[updated]
+            preprocessor.embedding = embedding
+        
+        digests = content_digests(movies)
+        preprocessor.content_digests = np.concatenate([self.content_digests, digests[added]])
+        preprocessor.content_digests[positions[updated]] = digests[updated]
+        preprocessor._set_movie_ids(np.concatenate([self.movie_ids, movie_ids[added]]))
+        
+        changed_indices = np.concatenate([positions[updated], n_movies + np.arange(len(added))])
+        return preprocessor, changed_indices
+    
+    def get_movie_id(self, index):
+        """Get the database ID of the movie at a matrix row"""
+        return int(self.movie_ids[index])
+    
     def find_similar(self, movie_id, top_k=10):
         """Find similar movies using cosine similarity.
         
@@ -57,7 +382,7 @@ class MoviePreprocessor:
             top_k: Number of similar movies to return
             
         Returns:
-            List of movie objects (excluding the reference movie)
+            List of movie IDs (excluding the reference movie)
         """
         if self.tfidf_matrix is None:
             return []
@@ -66,20 +391,13 @@ class MoviePreprocessor:
         if movie_idx is None:
             return []
         
-        # Compute similarity
-        similarity_matrix = self.compute_similarity_matrix()
-        similarity_scores = similarity_matrix[movie_idx]
+        # Score just this movie's row against the catalog
+        similarity_scores = self.similarity_scores(movie_idx)
+        similarity_scores[movie_idx] = -np.inf
         
         # Get top similar movies (excluding the movie itself)
-        similar_indices = np.argsort(similarity_scores)[::-1][1:top_k+1]
-        
-        result = []
-        for idx in similar_indices:
-            movie = self.get_movie_by_index(int(idx))
-            if movie:
-                result.append(movie)
-        
-        return result
+        similar_indices, _ = select_top_k(similarity_scores[np.newaxis, :], min(top_k, len(similarity_scores) - 1))
+        return [self.get_movie_id(int(idx)) for idx in similar_indices[0]]
     
     def build_index(self, movies):
         """Legacy method for compatibility - same as fit"""
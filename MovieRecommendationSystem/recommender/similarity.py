@@ -0,0 +1,202 @@
+import numpy as np
+from scipy import sparse
+
+
+def to_dense(matrix):
+    """Return a product result as a dense ndarray, whether it came out sparse or not."""
+    return matrix.toarray() if sparse.issparse(matrix) else np.asarray(matrix)
+
+
+def top_k(scores, k):
+    """Row-wise top-k of a 2-D score array, best first.
+
+    Uses argpartition so only the k winners of each row are sorted. Ties are
+    broken by column index, which keeps results deterministic.
+
+    Returns:
+        Tuple (indices, values) of shape (rows, min(k, columns))
+    """
+    n_rows, n_cols = scores.shape
+    k = min(k, n_cols)
+    if k <= 0:
+        return np.empty((n_rows, 0), dtype=np.int32), np.empty((n_rows, 0), dtype=np.float32)
+
+    if k < n_cols:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n_cols), scores.shape).copy()
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+
+    order = np.lexsort((candidates, -candidate_scores), axis=1)
+    indices = np.take_along_axis(candidates, order, axis=1).astype(np.int32)
+    values = np.take_along_axis(candidate_scores, order, axis=1).astype(np.float32)
+    return indices, values
+
+
+def neighbor_rows(matrix, matrix_t, start, stop, k, block_size=256):
+    """Top-k neighbors of rows start..stop, scored block_size rows at a time.
+
+    `matrix` holds L2-normalized rows and `matrix_t` its transpose, so each
+    block product is cosine similarity. Each row's own column is excluded.
+    """
+    indices = np.empty((stop - start, k), dtype=np.int32)
+    scores = np.empty((stop - start, k), dtype=np.float32)
+    for block_start in range(start, stop, block_size):
+        block_stop = min(block_start + block_size, stop)
+        block = to_dense(matrix[block_start:block_stop] @ matrix_t)
+        block[np.arange(block_stop - block_start), np.arange(block_start, block_stop)] = -np.inf
+        indices[block_start - start:block_stop - start], scores[block_start - start:block_stop - start] = \
+            top_k(block, k)
+    return indices, scores
+
+
+class DenseSimilarity:
+    """Full N×N similarity matrix (the original precomputed mode)."""
+
+    def __init__(self, similarity_matrix):
+        self.similarity_matrix = similarity_matrix
+
+    def neighbors(self, movie_idx, top_n):
+        """Return (indices, scores) of the top_n movies most similar to movie_idx."""
+        indices, scores = self.neighbors_batch([movie_idx], top_n)
+        return indices[0], scores[0]
+
+    def neighbors_batch(self, movie_indices, top_n):
+        """Return (indices, scores) arrays shaped (len(movie_indices), top_n)."""
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        rows = np.array(self.similarity_matrix[movie_indices], dtype=np.float32)
+        rows[np.arange(len(movie_indices)), movie_indices] = -np.inf
+        return top_k(rows, min(top_n, rows.shape[1] - 1))
+
+
+class NeighborTable:
+    """Top-K neighbor lists per movie, stored as compact int32/float32 arrays.
+
+    Row i holds the K most similar movies to movie i (itself excluded), best
+    first, so memory is O(N·K) instead of O(N²).
+    """
+
+    def __init__(self, indices, scores):
+        self.indices = indices
+        self.scores = scores
+
+    @property
+    def top_k(self):
+        return self.indices.shape[1]
+
+    def neighbors(self, movie_idx, top_n):
+        """Return (indices, scores) of the top_n movies most similar to movie_idx."""
+        indices, scores = self.neighbors_batch([movie_idx], top_n)
+        return indices[0], scores[0]
+
+    def neighbors_batch(self, movie_indices, top_n):
+        """Return (indices, scores) arrays shaped (len(movie_indices), top_n)."""
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        return self.indices[movie_indices, :top_n], self.scores[movie_indices, :top_n]
+
+    def with_updates(self, vectors, changed_indices, block_size=65536, max_block_scores=1 << 24):
+        """Return a new table after some rows were replaced or appended.
+
+        Changed rows get freshly computed neighbor lists. Every other row
+        merges its current list with its fresh scores against the changed
+        movies, so the cost is O(M·nnz) for the M changed rows plus
+        O(N·(K + M)) for the merge, instead of a full all-pairs rebuild.
+        Rows that listed a changed movie are rescored exactly, since its
+        new score may have pushed it below neighbors the table never kept.
+
+        Scores against the changed movies are computed one column block at a
+        time, and the changed rows' own lists are merged block by block, so
+        memory stays at about max_block_scores floats however large M·N is.
+
+        Args:
+            vectors: Updated L2-normalized row vectors; rows past the current
+                table are appended movies
+            changed_indices: Rows of `vectors` that were replaced or appended
+            block_size: Most catalog rows merged per block
+            max_block_scores: Most (row, changed movie) scores held per block
+        """
+        changed = np.asarray(changed_indices, dtype=np.int64)
+        n_old, k = self.indices.shape
+        n_new = vectors.shape[0]
+        changed_vectors_t = vectors[changed].T
+        step = max(1, min(block_size, max_block_scores // max(len(changed), 1)))
+
+        indices = np.empty((n_new, k), dtype=np.int32)
+        scores = np.empty((n_new, k), dtype=np.float32)
+        stale = np.zeros(n_new, dtype=bool)
+        # Running top-k of the changed rows, merged across blocks (columns ascend, so ties keep column order)
+        changed_top = np.empty((len(changed), 0), dtype=np.int32)
+        changed_scores = np.empty((len(changed), 0), dtype=np.float32)
+        for start in range(0, n_new, step):
+            stop = min(start + step, n_new)
+            # (block rows, changed movies): each block row's fresh score against every changed movie
+            fresh = to_dense(vectors[start:stop] @ changed_vectors_t).astype(np.float32)
+            in_block = (changed >= start) & (changed < stop)
+            fresh[changed[in_block] - start, np.flatnonzero(in_block)] = -np.inf
+
+            block_top, block_scores = top_k(fresh.T, k)
+            merged_top = np.concatenate([changed_top, block_top + start], axis=1)
+            picked, changed_scores = top_k(np.concatenate([changed_scores, block_scores], axis=1), k)
+            changed_top = np.take_along_axis(merged_top, picked, axis=1)
+
+            old_stop = min(stop, n_old)
+            if start >= old_stop:
+                continue
+            rows = old_stop - start
+            old_indices = np.asarray(self.indices[start:old_stop])
+            old_scores = np.array(self.scores[start:old_stop], dtype=np.float32)
+            # Entries pointing at changed movies are superseded by their fresh scores
+            superseded = np.isin(old_indices, changed)
+            old_scores[superseded] = -np.inf
+            stale[start:old_stop] = superseded.any(axis=1)
+
+            merged_indices = np.concatenate(
+                [old_indices, np.broadcast_to(changed.astype(np.int32), (rows, len(changed)))], axis=1)
+            merged_scores = np.concatenate([old_scores, fresh[:rows]], axis=1)
+            picked, scores[start:old_stop] = top_k(merged_scores, k)
+            indices[start:old_stop] = np.take_along_axis(merged_indices, picked, axis=1)
+
+        stale[changed] = False
+        indices[changed], scores[changed] = changed_top, changed_scores
+
+        stale_rows = np.flatnonzero(stale)
+        for start in range(0, len(stale_rows), 256):
+            rows = stale_rows[start:start + 256]
+            block = to_dense(vectors[rows] @ vectors.T).astype(np.float32)
+            block[np.arange(len(rows)), rows] = -np.inf
+            indices[rows], scores[rows] = top_k(block, k)
+        return NeighborTable(indices, scores)
+
+
+class RowScorer:
+    """Scores query rows against the catalog on demand.
+
+    Keeps only the L2-normalized row vectors (sparse TF-IDF or a dense
+    embedding); each query is a matrix-vector product, O(nnz) per row for
+    TF-IDF, and no N×N or N×K structure is ever built. Suited to large or
+    frequently changing catalogs.
+    """
+
+    def __init__(self, matrix):
+        self.matrix = matrix.tocsr() if sparse.issparse(matrix) else matrix
+
+    def scores(self, movie_indices):
+        """Dense (len(movie_indices), N) cosine scores of the given rows."""
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        return to_dense(self.matrix @ self.matrix[movie_indices].T).T.astype(np.float32)
+
+    def neighbors(self, movie_idx, top_n):
+        """Return (indices, scores) of the top_n movies most similar to movie_idx."""
+        indices, scores = self.neighbors_batch([movie_idx], top_n)
+        return indices[0], scores[0]
+
+    def neighbors_batch(self, movie_indices, top_n):
+        """Return (indices, scores) arrays shaped (len(movie_indices), top_n)."""
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        rows = self.scores(movie_indices)
+        rows[np.arange(len(movie_indices)), movie_indices] = -np.inf
+        return top_k(rows, min(top_n, rows.shape[1] - 1))
+
+    def with_updates(self, vectors, changed_indices):
+        """Nothing is precomputed, so an update just swaps in the new vectors."""
+        return RowScorer(vectors)
@@ -1,42 +1,37 @@
 from flask import Blueprint, render_template, request, jsonify
+from database.browse import browse_movies
+from database.genres import genre_list_cache
 from database.models import Movie
+from database.revision import catalog_revision
+from database.search import search_movies
 from config import Config
+from http_cache import conditional
+from recommender.manager import engine_manager
 
 movies_bp = Blueprint('movies', __name__)
 
 @movies_bp.route('/')
+@conditional()
 def index():
     page = request.args.get('page', 1, type=int)
     genre = request.args.get('genre', '')
     sort_by = request.args.get('sort', 'popularity')
     
-    query = Movie.query
-    
-    # Filter by genre
-    if genre:
-        query = query.filter(Movie.genres.like(f'%{genre}%'))
-    
-    # Sort
-    if sort_by == 'rating':
-        query = query.order_by(Movie.vote_average.desc(), Movie.vote_count.desc())
-    elif sort_by == 'recent':
-        query = query.order_by(Movie.release_date.desc())
-    else:  # popularity
-        query = query.order_by(Movie.popularity.desc())
-    
-    pagination = query.paginate(
+    # Keyset pagination: Next/Prev links carry a cursor, so deep pages cost the same as
+    # the first; the genre filter is an exact match through the movie_genres index
+    revision = catalog_revision()[0]
+    pagination = browse_movies(
+        sort_by=sort_by,
+        genre=genre,
         page=page,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
         per_page=Config.MOVIES_PER_PAGE,
-        error_out=False
+        version=revision
     )
     
-    # Get unique genres
-    all_movies = Movie.query.all()
-    genres_set = set()
-    for movie in all_movies:
-        if movie.genres:
-            genres_set.update(movie.genres.split())
-    genres = sorted(list(genres_set))
+    # Genres with movie counts, cached until the catalog revision changes
+    genres = genre_list_cache.get(revision)
     
     return render_template('index.html',
                          movies=pagination.items,
@@ -46,6 +41,7 @@ def index():
                          current_sort=sort_by)
 
 @movies_bp.route('/movie/<int:movie_id>')
+@conditional(engine=True)
 def movie_detail(movie_id):
     movie = Movie.query.get_or_404(movie_id)
     
@@ -60,15 +56,25 @@ def movie_detail(movie_id):
     return render_template('movie_detail.html', movie=movie, similar_movies=similar_movies)
 
 @movies_bp.route('/search')
+@conditional(engine=True)
 def search():
     query = request.args.get('q', '')
     
     if not query:
         return jsonify([])
     
-    movies = Movie.query.filter(
-        Movie.title.ilike(f'%{query}%')
-    ).order_by(Movie.popularity.desc()).limit(10).all()
+    # In-memory title prefix index first (no database access); queries it cannot
+    # answer go to the full-text index, and the LIKE scan where FTS5 is unavailable
+    movies = None
+    engine = engine_manager.get()
+    if engine is not None and engine.title_index is not None and not Config.SEARCH_INCLUDE_OVERVIEW:
+        movies = engine.title_index.search(query, limit=10) or None
+    if movies is None:
+        movies = search_movies(query, limit=10, include_overview=Config.SEARCH_INCLUDE_OVERVIEW)
+    if movies is None:
+        movies = Movie.query.filter(
+            Movie.title.ilike(f'%{query}%')
+        ).order_by(Movie.popularity.desc()).limit(10).all()
     
     results = [{
         'id': m.id,
@@ -2,20 +2,58 @@ from flask import Blueprint, render_template, request, jsonify, flash, redirect,
 from flask_login import login_required, current_user
 from database.db import db
 from database.models import Watchlist, Movie
+from database.browse import watchlist_page
 from config import Config
+from metrics import RECOMMENDATION_DURATION
+from recommender.batch import load_precomputed, load_watchlist, watchlist_digest
+from recommender.cache import recommendation_cache
 
 user_bp = Blueprint('user', __name__)
 
+# Largest number of movie IDs accepted by the batch watchlist check (a card grid page is 20)
+MAX_STATUS_IDS = 200
+# Largest page the watchlist API returns
+MAX_WATCHLIST_PAGE = 100
+
 @user_bp.route('/watchlist')
 @login_required
 def watchlist():
-    watchlist_items = Watchlist.query.filter_by(
-        user_id=current_user.id
-    ).order_by(Watchlist.added_at.desc()).all()
-    
-    movies = [item.movie for item in watchlist_items if item.movie]
+    # Newest first, keyset-paged, with movies joined into the same query
+    pagination = watchlist_page(
+        current_user.id,
+        page=request.args.get('page', 1, type=int),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=Config.MOVIES_PER_PAGE
+    )
+    watchlist_items = [item for item in pagination.items if item.movie]
+    movies = [item.movie for item in watchlist_items]
     
-    return render_template('watchlist.html', movies=movies, watchlist_items=watchlist_items)
+    return render_template('watchlist.html', movies=movies, watchlist_items=watchlist_items,
+                           pagination=pagination)
+
+@user_bp.route('/api/watchlist')
+@login_required
+def watchlist_api():
+    # Paginated watchlist with just the fields the cards render; pass next_cursor back as ?after=
+    per_page = min(max(request.args.get('limit', Config.MOVIES_PER_PAGE, type=int), 1), MAX_WATCHLIST_PAGE)
+    pagination = watchlist_page(current_user.id, after=request.args.get('after'), per_page=per_page)
+    
+    items = [{
+        'id': item.movie.id,
+        'title': item.movie.title,
+        'year': item.movie.release_date[:4] if item.movie.release_date else '',
+        'poster': item.movie.poster_path,
+        'rating': round(item.movie.vote_average, 1) if item.movie.vote_average else 0,
+        'watched': bool(item.watched),
+        'added_at': item.added_at.isoformat() if item.added_at else None
+    } for item in pagination.items if item.movie]
+    
+    return jsonify({
+        'items': items,
+        'total': pagination.total,
+        'next_cursor': pagination.next_cursor
+    })
 
 @user_bp.route('/watchlist/add', methods=['POST'])
 @login_required
@@ -41,6 +79,7 @@ def add_to_watchlist():
     try:
         db.session.add(watchlist_item)
         db.session.commit()
+        recommendation_cache.invalidate(current_user.id)
         return jsonify({'success': True, 'message': 'Added to watchlist'})
     except Exception as e:
         db.session.rollback()
@@ -66,6 +105,7 @@ def remove_from_watchlist():
     try:
         db.session.delete(watchlist_item)
         db.session.commit()
+        recommendation_cache.invalidate(current_user.id)
         return jsonify({'success': True, 'message': 'Removed from watchlist'})
     except Exception as e:
         db.session.rollback()
@@ -88,6 +128,7 @@ def toggle_watched():
     try:
         watchlist_item.watched = not watchlist_item.watched
         db.session.commit()
+        recommendation_cache.invalidate(current_user.id)
         return jsonify({
             'success': True,
             'watched': watchlist_item.watched
@@ -107,10 +148,35 @@ def recommendations():
         flash('Recommendation engine not ready. Please try again later.', 'warning')
         return redirect(url_for('movies.index'))
     
-    # Get personalized recommendations
-    recommended = recommendation_engine.get_recommendations_for_user(
+    # Get personalized recommendations, reusing them until the watchlist or engine changes
+    top_n = Config.TOP_N_RECOMMENDATIONS
+    genre = request.args.get('genre') or None
+    language = request.args.get('language') or None
+    # Everything below works from this one read of the watchlist, and its digest is part of
+    # the cache key: a result computed from an older watchlist is unreachable in every worker
+    user_watchlist = load_watchlist(current_user.id)
+    
+    def compute():
+        # Batch-precomputed rows serve the default list unless the watchlist changed since
+        if not genre and not language:
+            with RECOMMENDATION_DURATION.time('precomputed'):
+                precomputed = load_precomputed(current_user.id, top_n, user_watchlist)
+            if precomputed:
+                return precomputed
+        with RECOMMENDATION_DURATION.time('live'):
+            return recommendation_engine.get_recommendations_for_user(
+                current_user.id,
+                top_n=top_n,
+                genre=genre,
+                language=language,
+                user_watchlist=user_watchlist
+            )
+    
+    recommended = recommendation_cache.get_or_compute(
         current_user.id,
-        top_n=Config.TOP_N_RECOMMENDATIONS
+        (recommendation_engine.version, watchlist_digest(user_watchlist)),
+        (top_n, genre, language),
+        compute
     )
     
     movies = [movie for movie, score in recommended]
@@ -125,4 +191,26 @@ def check_watchlist(movie_id):
         movie_id=movie_id
     ).first() is not None
     
-    return jsonify({'in_watchlist': exists})
\ No newline at end of file
+    return jsonify({'in_watchlist': exists})
+
+@user_bp.route('/check-watchlist')
+@login_required
+def check_watchlist_batch():
+    # Status of every card on a page in one query: ?ids=1,2,3 -> {"in_watchlist": {"1": true, ...}}
+    try:
+        movie_ids = [int(movie_id) for movie_id in request.args.get('ids', '').split(',') if movie_id.strip()]
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Movie IDs must be integers'}), 400
+    
+    if len(movie_ids) > MAX_STATUS_IDS:
+        return jsonify({'success': False, 'message': f'At most {MAX_STATUS_IDS} movie IDs per request'}), 400
+    
+    in_watchlist = set()
+    if movie_ids:
+        # Served by the (user_id, movie_id) unique index
+        in_watchlist = {movie_id for movie_id, in db.session.query(Watchlist.movie_id).filter(
+            Watchlist.user_id == current_user.id,
+            Watchlist.movie_id.in_(movie_ids)
+        )}
+    
+    return jsonify({'in_watchlist': {str(movie_id): movie_id in in_watchlist for movie_id in movie_ids}})
@@ -156,24 +156,36 @@ function showToast(message, type = 'info') {
     }, 3000);
 }
 
-// Check watchlist status on page load
+// Check watchlist status on page load, for every card in as few requests as possible
+// (the server answers at most MAX_STATUS_IDS ids per request)
+const MAX_STATUS_IDS = 200;
+
 document.addEventListener('DOMContentLoaded', async function() {
     const watchlistButtons = document.querySelectorAll('.btn-watchlist[data-movie-id]');
+    if (watchlistButtons.length === 0) {
+        return;
+    }
+    
+    const movieIds = [...new Set(Array.from(watchlistButtons, button => button.dataset.movieId))];
+    const chunks = [];
+    for (let start = 0; start < movieIds.length; start += MAX_STATUS_IDS) {
+        chunks.push(movieIds.slice(start, start + MAX_STATUS_IDS));
+    }
     
-    for (const button of watchlistButtons) {
-        const movieId = button.dataset.movieId;
+    try {
+        const responses = await Promise.all(chunks.map(chunk =>
+            fetch(`/check-watchlist?ids=${chunk.join(',')}`).then(response => response.json())
+        ));
+        const inWatchlist = Object.assign({}, ...responses.map(data => data.in_watchlist || {}));
         
-        try {
-            const response = await fetch(`/check-watchlist/${movieId}`);
-            const data = await response.json();
-            
-            if (data.in_watchlist) {
+        for (const button of watchlistButtons) {
+            if (inWatchlist[button.dataset.movieId]) {
                 button.classList.add('in-watchlist');
                 button.textContent = '✓ In Watchlist';
             }
-        } catch (error) {
-            console.error('Error checking watchlist:', error);
         }
+    } catch (error) {
+        console.error('Error checking watchlist:', error);
     }
 });
 